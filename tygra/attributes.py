@@ -61,10 +61,16 @@ import re
 TYPES = ['text', 'mtext', 'int', 'float', 'color', 'set', 'bool', 'choices', 'unknown']
 
 class AttrObserver(ABC):
+	__slots__ = ()
 	@abstractmethod
 	def notifyAttrChanged(self, attrsObject, name:str, value:Any): pass
+	def notifyAttrsChanged(self, attrsObject, items:List[Tuple[str,Any]]):
+		"""Several attributes changed at once. Observers that can do better than one call per item should override."""
+		for name, value in items:
+			self.notifyAttrChanged(attrsObject, name, value)
 	
 class AttrOwner(ABC):
+	__slots__ = ()
 	@abstractmethod
 	def getAttrParents(self) -> list: pass
 
@@ -305,6 +311,17 @@ class Attributes(PO):
 			except Exception as ex:
 				print(f'WARNING: Attributes.notifyObservers(): While notifying {ob}: {type(ex).__name__}, {ex}.')
 		
+	def notifyObserversBatch(self, items:List[Tuple[str,Any]]):
+		"""
+		Notify all the observers on the observers list of several changed (key, value) pairs in a
+		single *notifyAttrsChanged()* call each.
+		"""
+		for ob in self.observers:
+			try:
+				ob.notifyAttrsChanged(self, items)
+			except Exception as ex:
+				print(f'WARNING: Attributes.notifyObserversBatch(): While notifying {ob}: {type(ex).__name__}, {ex}.')
+		
 	def ping(self, key):
 		"""
 		Calling this method signals to the Attributes object that some parent (getParents())
@@ -479,7 +496,7 @@ class Attributes(PO):
 		
 	### OPERATIONS #######################################################################
 		
-	def get(self, key, includeLocals=True, includeInherited=True):
+	def get(self, key, includeLocals=True, includeInherited=True, default=None):
 		"""
 		Public getter.  Returns the value for the key.
 		
@@ -488,9 +505,10 @@ class Attributes(PO):
 			if you want to check if this is an inherited value.
 		:param includeInterited: Suppress looking for inherited key values by setting this to *False*.
 			Useful if you want to check for only local values.
+		:param default: The value to return if the key isn't found.
 		"""
 		ret = self._get(key, includeLocals=includeLocals, includeInherited=includeInherited)
-		return ret.value if ret else None
+		return ret.value if ret else default
 
 	def isEditable(self, key):
 		"""Returns *true* iff the *key* is editable."""
@@ -625,7 +643,8 @@ class Attributes(PO):
 		:param title: A title to put on the dialog window.
 		:param disabled: Setting this to *False* will still show the dialog, but all fields will the locked (uneditable).
 		"""
-		print(f"Attributes.edit(): {self.__str__(True)}")
+		if __debug__ and AttrEditor._verbose:
+			print(f"Attributes.edit(): {self.__str__(True)}")
 		editor = AttrEditor(parentWindow, self, title=title)
 		editor.show(disabled=disabled)
 		editor.destroy()
@@ -637,6 +656,8 @@ ChangeDescr = namedtuple("ChangeDescr", "oldValue tkVar delete")
 		
 class AttrEditor(tk.Toplevel):
 
+	_verbose = False # set to True to trace editor actions to stdout (debugging only)
+
 	def __init__(self, parent, attrs:Attributes, title="Attribute Editor"):
 		super().__init__(parent)
 		self.parent = parent
@@ -808,7 +829,8 @@ class AttrEditor(tk.Toplevel):
 
 	def override(self, key, item, editor, button):
 		text = button.config()['text'][-1]
-		print(f"override: text = {text}")
+		if __debug__ and self._verbose:
+			print(f"override: text = {text}")
 		if text == 'override':
 			button.config(text='revert')
 			self.conf(editor, state="!disabled", foreground="black")
@@ -820,7 +842,8 @@ class AttrEditor(tk.Toplevel):
 		
 	def deleteAttr(self, key, item, editor, button):
 		text = button.config()['text'][-1]
-		print(f"deleteAttr: text = '{text}'")
+		if __debug__ and self._verbose:
+			print(f"deleteAttr: text = '{text}'")
 		if text == 'delete':
 			button.config(text='undelete')
 			editor.config(state="disabled")
@@ -832,7 +855,8 @@ class AttrEditor(tk.Toplevel):
 
 	def deleteAndInhAttr(self, key, item, editor, button):
 		text = button.config()['text'][-1]
-		print(f"deleteAndInhAttr: text = {text}")
+		if __debug__ and self._verbose:
+			print(f"deleteAndInhAttr: text = {text}")
 		if text == 'del&inherit':
 			button.config(text='undelete')
 			self.conf(editor, state="disabled", foreground="blue")
@@ -851,6 +875,7 @@ class AttrEditor(tk.Toplevel):
 		self.destroy()
 		
 	def save(self):
+		changed = []
 		for k,v in self.vars.items():
 			if v.delete: # flagged for deletion
 				self.attrs.remove(k)
@@ -883,18 +908,21 @@ class AttrEditor(tk.Toplevel):
 					continue
 					
 			if v.oldValue != newValue:
-				print(f"AttrEditor.save(): {k} changed from '{v.oldValue}' ({type(v.oldValue).__name__}) to '{newValue}' ({type(newValue).__name__}). Observers={self.attrs.observers}.")
+				if __debug__ and self._verbose:
+					print(f"AttrEditor.save(): {k} changed from '{v.oldValue}' ({type(v.oldValue).__name__}) to '{newValue}' ({type(newValue).__name__}). Observers={self.attrs.observers}.")
 				try:
-					self.attrs.config(k, newValue)
+					self.attrs.config(k, newValue, suppressNotify=True) # notified all at once below
 				except KeyError:
 					self.attrs[k] = Attributes.Item(k, newValue)
 					# need to copy all the details from the inherited record to the new value...
 					inhRec = self.attrs._get(k, includeLocals=False)
 					inhRec.value = newValue
 					inhRec.editable = True # the editable attribute does not inherit
-					self.attrs.config(k, _record=inhRec)
+					self.attrs.config(k, _record=inhRec, suppressNotify=True)
 					
-				self.attrs.notifyObservers(k, newValue)
+				changed.append((k, newValue))
+		if changed:
+			self.attrs.notifyObserversBatch(changed)
 		self.grab_release()
 		self.destroy()
 
@@ -940,6 +968,25 @@ if __name__ == "__main__":
 	c2.attrs.add("width", 5000)
 	print(repr(c2.attrs), "s/b\n{height: (100, overridable, editable), another: (hi, overridable, editable), width: (5000, overridable, editable), x: (10, overridable, editable)}")
 	print(repr(c.attrs), "s/b\n{height: (3, overridable, editable), width: (5, overridable, editable)}")
+	
+	# a save of several values in the attribute editor is sent as a single batch
+	class StubVar: # stands in for the editor's tk.StringVar, so this check doesn't need a window
+		def __init__(self, value): self.value = value
+		def get(self): return self.value
+	class BatchObserver(AttrObserver):
+		def __init__(self): self.calls = []
+		def notifyAttrChanged(self, obj, name, value): self.calls.append('notifyAttrChanged')
+		def notifyAttrsChanged(self, obj, items): self.calls.append('notifyAttrsChanged')
+	ob = BatchObserver()
+	c.attrs.addObserver(ob)
+	editor = AttrEditor.__new__(AttrEditor) # save() only needs attrs and vars
+	editor.attrs = c.attrs
+	editor.vars = {k: ChangeDescr(c.attrs[k], StubVar(str(v)), False) for k, v in (("height", 30), ("width", 50))}
+	editor.grab_release = editor.destroy = lambda: None
+	editor.save()
+	print(ob.calls, "s/b ['notifyAttrsChanged']")
+	c.attrs.removeObserver(ob)
+	
 	root = tk.Tk()
 	c2.attrs.addObserver(c2)
 	c2.attrs["list"] = (1,2,3)
@@ -361,12 +361,32 @@ class IsaHierarchy(CellLayout):
 		pass
 		
 	def position2(self, rowInfo:Dict[int, list], xoffset, yoffset, cellWidth, cellHeight, vertical=True):
+		return (self._position_vertical if vertical else self._position_horizontal)(rowInfo, xoffset, yoffset, cellWidth, cellHeight)
+
+	def _position_vertical(self, rowInfo:Dict[int, list], xoffset, yoffset, cellWidth, cellHeight):
+		"Specialization of *position2* for *vertical*==True: rows run down the page."
+		maxX = 0
+		maxY = 0
+		for rowNum, row in rowInfo.items():
+			for cell in row:
+				x = cell.col * cellWidth + xoffset
+				y = cell.row * cellHeight + yoffset
+				cell.node.moveTo(x, y)
+				x = x + cellWidth
+				y = y + cellHeight
+				if x>maxX: maxX = x
+				if y>maxY: maxY = y
+				
+		return maxX, maxY
+
+	def _position_horizontal(self, rowInfo:Dict[int, list], xoffset, yoffset, cellWidth, cellHeight):
+		"Specialization of *position2* for *vertical*==False: rows run across the page."
 		maxX = 0
 		maxY = 0
 		for rowNum, row in rowInfo.items():
 			for cell in row:
-				x = (cell.col if vertical else cell.row) * cellWidth + xoffset
-				y = (cell.row if vertical else cell.col) * cellHeight + yoffset
+				x = cell.row * cellWidth + xoffset
+				y = cell.col * cellHeight + yoffset
 				cell.node.moveTo(x, y)
 				x = x + cellWidth
 				y = y + cellHeight
@@ -524,19 +544,17 @@ class IsaHierarchyCompressed(IsaHierarchy):
 		return self.moved
 						
 	def optimize(self, cells):
-		self.view.logger.write("starting optimizaiton", level="info")
-		count = 0
+		compacted = 0
 		while self.compact(cells): # while we moved something
-			count += 1
+			compacted += 1
 			self.view.container.update_idletasks()
 			self.view.container.update()
-		self.view.logger.write(f"compacted in {count} passes.", level='info')
-		count = 0
+		centered = 0
 		while self.centerParents(cells):
-			count += 1
+			centered += 1
 			self.view.container.update_idletasks()
 			self.view.container.update()
-		self.view.logger.write(f"centered in {count} passes.", level='info')
+		self.view.logger.write(f"optimization: compacted in {compacted} passes, centered in {centered} passes.", level='info')
 		
 	
 class IsaHierarchyHorizontal(IsaHierarchy):
@@ -557,8 +575,8 @@ class IsaHierarchyHorizontal(IsaHierarchy):
 		super().__init__(view, cellWidth=cellWidth, cellHeight=cellHeight,
 				marginWidth=marginWidth, marginHeight=marginHeight, **kwargs)
 
-	def position2(self, cell, xoffset, yoffset, cellWidth, cellHeight):
-		return super().position2(cell, xoffset, yoffset, cellWidth, cellHeight, vertical=False)
+	def position2(self, rowInfo, xoffset, yoffset, cellWidth, cellHeight):
+		return self._position_horizontal(rowInfo, xoffset, yoffset, cellWidth, cellHeight)
 
 	def get2ndOffset(self, prevMinX, prevMinY, prevMaxX, prevMaxY) -> Tuple[int, int]:
 		return prevMinX, prevMaxY
@@ -27,11 +27,16 @@ from io import TextIOWrapper
 import sys
 import os
 import traceback
+from types import FunctionType
 from tygra.util import play
 import tygra.util as util
 from pickle import NONE
 import inspect
 
+# level names (lower case) to level numbers; any prefix of "informational" is accepted
+_STR_TO_LEVEL = {"informational"[0:i]: 2 for i in range(len("informational")+1)}
+_STR_TO_LEVEL.update({"error": -1, "normal": 0, "warning": 1, "debug": 3})
+
 class LoggingPanedWindow(tk.PanedWindow):
 	"""
 	A (tkinter.PanedWindow) with two panes: above, and application widget according the
@@ -48,21 +53,55 @@ class LoggingPanedWindow(tk.PanedWindow):
 	"""
 
 	class StdoutRedirector(object):
-		def __init__(self, owner, tag, stdOutput):
+		"""
+		Stands in for *sys.stdout* or *sys.stderr*: everything written is forwarded
+		to *stdOutput* immediately, and is buffered and written to the *owner*'s text
+		area (tagged with *tag*) a few milliseconds later, so the many small fragments
+		produced by *print* cost only one insert.
+		"""
+		def __init__(self, owner, tag, stdOutput, delayMs:int=5):
 			self.owner = owner
 			self.tag = tag
+			self.tagTuple = (tag,)
 			self.stdOutput = stdOutput
+			self.delayMs = delayMs
+			self._buf:List[str] = []
+			self._scheduled = False
+			self._flushId = None
 
 		def write(self, string:str):
-			string = string.rstrip()
-			if len(string) == 0: return
-			self.stdOutput.write(string+"\n")
+			self.stdOutput.write(string)
+			if len(self._buf) == 0 and (len(string) == 0 or string.isspace()):
+				return # nothing pending, so this could only add a blank line
+			self._buf.append(string)
+			if not self._scheduled:
+				self._scheduled = True
+				self._flushId = self.owner.after(self.delayMs, self._flush)
+
+		def _flush(self):
+			self._scheduled = False
+			self._flushId = None
+			text = "".join(self._buf)
+			self._buf.clear()
+			lines = [line for line in (l.rstrip() for l in text.split("\n")) if len(line) > 0]
+			if len(lines) == 0: return
 			self.owner._prep()
-			self.owner.textArea.insert('end', string, self.tag)
+			self.owner._insert("\n".join(lines), self.tagTuple)
 			self.owner._finish()
 
 		def flush(self):
-			pass
+			"Write anything buffered to the text area now rather than waiting for the timer."
+			if self._scheduled:
+				self.owner.after_cancel(self._flushId)
+				self._flush()
+
+		def cancel(self):
+			"Drop the pending write to the text area (the owner is being deleted)."
+			if self._scheduled:
+				self.owner.after_cancel(self._flushId)
+				self._scheduled = False
+				self._flushId = None
+				self._buf.clear()
 
 	@property
 	def maxLevelStr(self):
@@ -77,6 +116,8 @@ class LoggingPanedWindow(tk.PanedWindow):
 				useStderr:bool=True, maxLevel:int=3, fixedAppFrame:bool=False, 
 				captureStdOutput:bool=True, 
 				soundError:Optional[str]='/System/Library/Sounds/Sosumi.aiff', 
+				flushIntervalMs:int=10,
+				immediateFlush:bool=False, logFlushIntervalMs:int=200,
 				**kwargs):
 		"""
 		:param parent: The parent window or frame.
@@ -99,6 +140,14 @@ class LoggingPanedWindow(tk.PanedWindow):
 		:param captureStdOutput: Capture any output to *sys.stdout* and *sys.stderr* and
 						display it before forwarding it back to *sys.stdout* and *sys.stderr*.
 		:param soundError: An sound file to play when an error level message occurs.
+		:param flushIntervalMs: Writes to the text widget are scrolled into view and
+						redrawn at most once per this many milliseconds, so a burst of
+						messages only costs one redraw. [default: 10]
+		:param immediateFlush: If *True*, flush the *logFiles* after every message. 
+						Otherwise they are flushed *logFlushIntervalMs* milliseconds 
+						after a message, and after any error-level message. [default: False]
+		:param logFlushIntervalMs: The delay before flushing *logFiles* when 
+						*immediateFlush* is *False*. [default: 200]
 		:param \*\*kwargs: An arguments *dict* to passed to the *tk.PanedWindow* constructor.
 		"""
 		# fix up kwargs to contain the necessary defaults and create the PanedWindow (super).
@@ -119,23 +168,32 @@ class LoggingPanedWindow(tk.PanedWindow):
 		self.soundError = soundError
 		self.lastTraceback = "<No traceback recorded>"
 		self.tracebackCount = 0
+		self._lineCount = 1 # lines in textArea, tracked here to avoid querying Tk
+		self._hasText = False
 		self.fixedAppFrame = fixedAppFrame
 		self.appFrame = None
+		self.flushIntervalMs = flushIntervalMs
+		self._pendingFlush = False
+		self._doFlushId = None
+		self.immediateFlush = immediateFlush
+		self.logFlushIntervalMs = logFlushIntervalMs
+		self._logFlushId = None
 
 		# set up the internal frames within the PanedWindow.
 		self.textArea = tk.Text(self, state='disabled', wrap='none', width=80, height=visibleLines, borderwidth=0)#ttk.Labelframe(self.panedWindow, text='Pane1')#, width=100, height=100)
 		self.textArea.pack(fill=tk.BOTH, side=tk.TOP, expand=True)
 		self.pack(fill=tk.BOTH, expand=True)
-		self.textArea.tag_config("traceback"    , foreground="purple", font="Courier 0")
-		self.textArea.tag_config("error"        , foreground="red")
-		self.textArea.tag_config("normal"       , foreground="black")
-		self.textArea.tag_config("warning"      , foreground="brown")
-		self.textArea.tag_config("informational", foreground="grey")
-		self.textArea.tag_config("debug"        , foreground="green")
-		self.textArea.tag_config("errorTag"     , foreground="red"  , font=self.textArea.cget("font")+" 0 bold")
-		self.textArea.tag_config("warningTag"   , foreground="brown", font=self.textArea.cget("font")+" 0 bold")
-		self.textArea.tag_config("stdout"       , foreground="black", font="Courier 0 italic")
-		self.textArea.tag_config("stderr"       , foreground="red"  , font="Courier 0 bold italic")
+		# configure all the tags in one trip to Tcl
+		baseFont = self.textArea.cget("font")
+		script = []
+		for name, fg, font in LoggingPanedWindow._TAGS:
+			options = f'-foreground {fg}'
+			if font is not None:
+				options += f' -font {{{font.format(base=baseFont)}}}'
+			script.append(f'{self.textArea} tag configure {name} {options}')
+		self.tk.eval("\n".join(script))
+		self.textArea.tag_bind("tracebackLink", "<Button-1>", self._tracebackClick)
+		self._tbById:Dict[int,str] = dict() # traceback strings for the "tb<N>" tags in the text
 
 		stretch = 'always' if fixedAppFrame else 'never'
 		sticky = 'news' if fixedAppFrame else 'new'
@@ -155,7 +213,7 @@ class LoggingPanedWindow(tk.PanedWindow):
 		if logFiles is None:
 			self.logFiles = []
 		else:
-			if not isinstance(logFiles, list): self.logFiles = [logFiles]
+			self.logFiles = list(logFiles) if isinstance(logFiles, list) else [logFiles]
 		# check type and writability of items in the logFiles parameter
 		bad = []
 		for f in self.logFiles:
@@ -167,11 +225,34 @@ class LoggingPanedWindow(tk.PanedWindow):
 			if not f.writable():
 				self.write(f'Got a file in "logFiles" argument that does not appear to be writable.', level=-1)
 				bad.append(f)
-		for f in bad: self.logFiles.remove(f)
+		if len(bad) > 0:
+			badIds = set(map(id, bad)) # by identity: file wrappers may have odd equality
+			self.logFiles = [f for f in self.logFiles if id(f) not in badIds]
+		
+	def _flushLogs(self):
+		"""
+		Flush the *logFiles* *logFlushIntervalMs* after the first unflushed record was
+		written to them (see the *immediateFlush* constructor parameter and *write()*).
+		"""
+		self._logFlushId = None
+		for f in self.logFiles:
+			f.flush()
 		
 	def delete(self):
+		for stream in (sys.stdout, sys.stderr):
+			if isinstance(stream, LoggingPanedWindow.StdoutRedirector) and stream.owner is self:
+				stream.cancel() # (already forwarded to the real stream, so nothing is lost)
 		sys.stdout = self.realStdout
 		sys.stderr = self.realStderr
+		if self._logFlushId is not None:
+			self.after_cancel(self._logFlushId)
+			self._logFlushId = None
+		if self._doFlushId is not None:
+			self.after_cancel(self._doFlushId)
+			self._doFlushId = None
+			self._pendingFlush = False
+		for f in self.logFiles:
+			if not f.closed: f.flush()
 		for i in range(len(self.logFiles)):
 			self.logFiles[i] = None
 		self.logFiles = None
@@ -181,6 +262,26 @@ class LoggingPanedWindow(tk.PanedWindow):
 					 1: "warning",
 					 2: "informational",
 					 3: "debug"}
+					 
+	# text area tags: (name, foreground, font); "{base}" in a font is the text area's font
+	_TAGS = (("traceback"    , "purple", "Courier 0"),
+			 ("error"        , "red"   , None),
+			 ("normal"       , "black" , None),
+			 ("warning"      , "brown" , None),
+			 ("informational", "grey"  , None),
+			 ("debug"        , "green" , None),
+			 ("errorTag"     , "red"   , "{base} 0 bold"),
+			 ("warningTag"   , "brown" , "{base} 0 bold"),
+			 ("stdout"       , "black" , "Courier 0 italic"),
+			 ("stderr"       , "red"   , "Courier 0 bold italic"),
+			 ("tracebackLink", "blue"  , None))
+	
+	# level: (body tag tuple, log file prefix, window prefix segments)
+	_LEVEL_INFO = {	-1: (("error",),         "***ERROR***: ", ("ERROR: ",   ("errorTag",))),
+					 0: (("normal",),        "",              ()),
+					 1: (("warning",),       "*WARNING*: ",   ("WARNING: ", ("warningTag",))),
+					 2: (("informational",), "",              ()),
+					 3: (("debug",),         "DEBUG: ",       ("DEBUG: ",   ("debug",)))}
 
 	def setAppFrame(self, frame:Optional[tk.Frame]):
 		if self.appFrame is not None:
@@ -205,12 +306,10 @@ class LoggingPanedWindow(tk.PanedWindow):
 			if obj > 3:  return 3
 			return obj
 		if isinstance(obj, str):
-			obj = obj.lower()
-			if obj == "error":   return -1
-			if obj == "normal":  return 0
-			if obj == "warning": return 1
-			if obj == "informational"[0:len(obj)]: return 2
-			if obj == "debug":   return 3
+			try:
+				return _STR_TO_LEVEL[obj]
+			except KeyError:
+				return _STR_TO_LEVEL.get(obj.lower(), 0)
 		return 0
 		
 	def setMaxLevel(self, level:Union[str,int]=2) -> int:
@@ -225,25 +324,63 @@ class LoggingPanedWindow(tk.PanedWindow):
 		self.maxLevel = level
 		return ret
 		
+	def _tracebackClick(self, event):
+		"Write out the traceback for the *[traceback]* link that was clicked on."
+		for tag in self.textArea.tag_names(f'@{event.x},{event.y}'):
+			if tag.startswith("tb") and tag[2:].isdigit():
+				self._writeTraceback(event, self._tbById.get(int(tag[2:])))
+				return
+		
+	def _pruneTracebacks(self):
+		"Forget the tracebacks whose links have been trimmed out of the text area."
+		for n in list(self._tbById):
+			if len(self.textArea.tag_ranges(f'tb{n}')) == 0:
+				self.textArea.tag_delete(f'tb{n}')
+				del self._tbById[n]
+		
 	def _writeTraceback(self, event, tbString=None):
 		self._prep()
-		self.textArea.insert('end', str(tbString), ('traceback',))		
+		self._insert(str(tbString), ('traceback',))		
 		self._finish()
 
+	def _insert(self, *segments):
+		"""
+		Insert *segments* (alternating text and tags, as for *tk.Text.insert()*) at the
+		end of the text area, keeping the line count up to date.
+		"""
+		self.textArea.insert('end', *segments)
+		self._lineCount += sum(str(text).count('\n') for text in segments[0::2])
+		self._hasText = True
+
 	def _prep(self):
-		numlines = int(self.textArea.index('end - 1 line').split('.')[0])
 		self.textArea['state'] = 'normal'
-		if numlines >= self.maxLines:
-			self.textArea.delete('1.0', f'{self.maxLines-numlines+2}.0')
-		if self.textArea.index('end-1c')!='1.0':
-			self.textArea.insert('end', '\n')
+		if self.maxLines > 0 and self._lineCount >= self.maxLines:
+			# trim in chunks of about 10% so we aren't deleting on every write
+			n = self._lineCount - self.maxLines + max(1, self.maxLines//10)
+			if n < self._lineCount:
+				self.textArea.delete('1.0', f'{n+1}.0')
+				self._lineCount -= n
+			else:
+				self.textArea.delete('1.0', 'end')
+				self._lineCount = 1
+				self._hasText = False
+			if len(self._tbById) > 0:
+				self._pruneTracebacks()
+		if self._hasText:
+			self._insert('\n')
 			
 	def _finish(self):
-		self.textArea.see('end -1 lines')
 		self.textArea['state'] = 'disabled'
-		top = self.winfo_toplevel()
-		top.update_idletasks()
-		top.update()		
+		if not self._pendingFlush:
+			self._pendingFlush = True
+			self._doFlushId = self.after(self.flushIntervalMs, self._doFlush)
+			
+	def _doFlush(self):
+		"Scroll to and redraw everything written since the last flush (see *_finish()*)."
+		self._pendingFlush = False
+		self._doFlushId = None
+		self.textArea.see('end -1 lines')
+		self.winfo_toplevel().update_idletasks()
 				
 	def write(self, msg, level:Union[str,int]=0, exception:Optional[Exception]=None):
 		"""
@@ -252,26 +389,24 @@ class LoggingPanedWindow(tk.PanedWindow):
 		:param level: A severity level for this message which may be displayed as a font
 				color or font change. May be a string ("error" "normal", "warning", "informational", "debug") or
 				an *int* (correspondingly -1 (or -ve), 0, 1, 2, 3).
+		
+		*msg* may also be a zero-argument function (typically a lambda) returning the message,
+		in which case it is only called if *level* is not filtered out by *maxLevel*, so
+		expensive formatting can be skipped. Other callable objects are written as they are.
 		"""
 		level = self._getLevel(level) # level is now guaranteed to be an int
 		if level > self.maxLevel:
 			return
+		if isinstance(msg, FunctionType):
+			msg = msg()
 			
 		self._prep()
 		
-		if   level == -1: 
-			self.textArea.insert('end', "ERROR: ", ("errorTag",))
-			prefix = "***ERROR***: "
-			if self.soundError is not None:
-				play(self.soundError)
-		elif level ==  1:
-			self.textArea.insert('end', "WARNING: ", ("warningTag",))
-			prefix = "*WARNING*: "
-		elif level ==  3:
-			self.textArea.insert('end', "DEBUG: ", ("debug",))
-			prefix = "DEBUG: "
-		else:
-			prefix = ""
+		# collect (text, tags) pairs so the whole record goes to Tk in a single insert
+		levelTag, prefix, prefixSegments = LoggingPanedWindow._LEVEL_INFO[level]
+		segments = list(prefixSegments)
+		if level == -1 and self.soundError is not None:
+			play(self.soundError)
 			
 		method = "" if level in [0,2] else (util.getCallerIdInfoStr()+": ")
 		
@@ -286,21 +421,18 @@ class LoggingPanedWindow(tk.PanedWindow):
 			output += m
 			msg += m
 
-		self.textArea.insert('end', f'{msg}', (LoggingPanedWindow.levelToTag[level],))
+		segments += [f'{msg}', levelTag]
 
 		if exception is not None:
 			self.tracebackCount += 1
-			tracebackTag = "tracebackLink"+str(self.tracebackCount)
-			tracebackCallback = lambda e, tbString=self.lastTraceback: self._writeTraceback(e, tbString)
-			self.textArea.tag_config(tracebackTag, foreground="blue")
-			self.textArea.tag_bind(tracebackTag, "<Button-1>", tracebackCallback)
-			self.textArea.insert('end', ' [traceback]')
-			self.textArea.tag_add(tracebackTag, "end-11c", "end-2c")
+			self._tbById[self.tracebackCount] = self.lastTraceback
+			segments += [' [', (), 'traceback', ("tracebackLink", f'tb{self.tracebackCount}'), ']', ()]
 			
 		if len(method) > 0:
 			indent = "    " if exception is not None else "  "
-			self.textArea.insert('end', f'\n{indent}in {method}', (LoggingPanedWindow.levelToTag[level],))
+			segments += [f'\n{indent}in {method}', levelTag]
 
+		self._insert(*segments)
 		self._finish()
 				
 		# write out to any logfiles
@@ -313,4 +445,8 @@ class LoggingPanedWindow(tk.PanedWindow):
 			f.write(f'{output}\n')
 			if exception is not None:
 				f.write(f'{self.lastTraceback}\n')
+			if self.immediateFlush or level < 0: # don't risk losing errors to a crash
+				f.flush()
+			elif self._logFlushId is None:
+				self._logFlushId = self.after(self.logFlushIntervalMs, self._flushLogs)
 		
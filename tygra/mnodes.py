@@ -23,14 +23,15 @@
 from tygra.attributes import Attributes
 from tygra.mobjects import MObject
 import xml.etree.ElementTree as et
-from ast import literal_eval
 from typing import Any, Optional, Union, Tuple, List, Dict
 from tygra.util import AddrServer, IDServer
 import tygra.app as app
-from tygra.weaklist import WeakList
 
 	
 class MNode(MObject):
+	__slots__ = ()
+	_kind = 'N'
+
 	def __init__(self, tgmodel, typ=None, idServer:IDServer=None, _id:Optional[int]=None):
 		"""
 		Constructs an MNode.
@@ -58,17 +59,9 @@ class MNode(MObject):
 
 	@classmethod
 	def getArgs(cls, elem: et.Element, addrServer:AddrServer) -> Tuple[List[Any], Dict[str, Any]]:
-		args = []
-		kwargs = dict()
 		tgmodel = addrServer.idLookup(elem.get('tgmodel'))
-		args.append(tgmodel)
-
 		idStr = elem.get('id')
-		id = IDServer.getLocalID(idStr) if idStr else None
-		kwargs["_id"] = id
-		kwargs["idServer"] = tgmodel
-		
-		return args, kwargs
+		return [tgmodel], {"_id": IDServer.getLocalID(idStr) if idStr else None, "idServer": tgmodel}
 	
 	def unserializeXML(self, elem: et.Element, addrServer:AddrServer):
 		"""
@@ -29,10 +29,25 @@ from string import whitespace
 import sys
 from tygra.util import PO, AddrServer, IDServer
 from tygra.attributes import Attributes
-from tygra.weaklist import WeakList
+from tygra.weaklist import WeakOrderedSet
+from weakref import WeakSet
+from collections import deque
 import tygra.app as app
 from _ast import Or
 
+_ATTRS_TAG = Attributes.__name__ # the element tag PO.serializeXML() gives an Attributes object
+
+_KNOWN_OPS = frozenset(('mod attr', 'mod attrs', 'add rel', 'del rel', 'del')) # see MObject.notifyModelChanged()
+
+# tygra.mrelations imports this module, so these can only be bound on first use (see _importRelationClasses())
+_Isa = None
+_MRelation = None
+
+def _importRelationClasses():
+	global _Isa, _MRelation
+	from tygra.mrelations import Isa, MRelation
+	_Isa, _MRelation = Isa, MRelation
+
 
 class ModelObserver(ABC):
 	@abstractmethod
@@ -43,10 +58,27 @@ class ModelObserver(ABC):
 		pass
 			
 class MObject(PO, at.AttrOwner, at.AttrObserver): #, ModelObserver):
+	__slots__ = ('tgmodel', 'observers', 'relations', '_isaParents', '_isaChildren',
+				'_deleted', 'attrs', '_ancestorsCache', '_ancestorIdsCache', '_idString', '__weakref__') # no __dict__: there are a lot of these objects
+
+	_kind = None # 'N' for MNodes, 'R' for MRelations; see MRelation.validateReferents()
+	_className = "MObject" # type(self).__name__, fixed per class by __init_subclass__() for serializeXML()
+	
+	def __init_subclass__(cls, **kwargs):
+		super().__init_subclass__(**kwargs)
+		cls._className = cls.__name__
 
 	@property
 	def system(self) -> bool:
 		return self.id < app.RESERVED_ID
+
+	@property
+	def idString(self) -> str:
+		"""
+		Overrides *PO.idString* to return the string computed once by the constructor:
+		an *MObject* always has an id and it never changes.
+		"""
+		return self._idString
 		
 	def __init__(self, tgmodel, typ, idServer:IDServer, _id:Optional[int]=None):
 		"""
@@ -58,13 +90,19 @@ class MObject(PO, at.AttrOwner, at.AttrObserver): #, ModelObserver):
 		"""
 		super().__init__(idServer=idServer, _id=_id)
 		assert self.id is not None
+		self._idString = idServer.getIDString(self.id)
 		self.tgmodel = tgmodel
-		self.observers = WeakList()
-		self.relations = WeakList()
+		self.observers = WeakSet()
+		self.relations = WeakOrderedSet()
+		self._isaParents:List[MObject] = []  # toNodes of our isa-relations, kept by addRelation()/notifyRelationDeletion()
+		self._isaChildren:List[MObject] = [] # fromNodes of isa-relations to us, ditto
+		self._ancestorsCache:Optional[list] = None # see flatAncestors()
+		self._ancestorIdsCache:Optional[frozenset] = None # see ancestorIds()
 		self._deleted = False
 		self.attrs = at.Attributes(owner=self)
 		self.attrs.addObserver(self)
-		from tygra.mrelations import Isa
+		if _Isa is None: _importRelationClasses()
+		Isa = _Isa
 		# _id is None only when we are creating this object at runtime (as opposed to reading from persistent store).
 		# (self.id is NOT None at this point though.)
 		if _id is None and not (self.tgmodel.topNode is None or self.tgmodel.topRelation is None) and not isinstance(self, Isa):
@@ -111,7 +149,7 @@ class MObject(PO, at.AttrOwner, at.AttrObserver): #, ModelObserver):
 				# isa relations -- don't have isa-parent
 				pass
 			else:
-				if len(self.isa()) <= 1: # isa includes self...
+				if all(p is self for p in self._isaParents): # (no need to walk all the ancestors with isa())
 					self.tgmodel.logger.write(f'{type(self).__name__} has no ISA parent.', level="error")
 					errors += 1
 				else:
@@ -122,7 +160,7 @@ class MObject(PO, at.AttrOwner, at.AttrObserver): #, ModelObserver):
 #			self.tgmodel.logger.write(f'{type(self).__name__} is a top object.', level="debug")
 			pass
 		
-		for parent in self.isparent():
+		for parent in self._isaParents:
 			if not parent.attrs["type"]:
 				self.tgmodel.logger.write(f'parent ({parent}) is not a Type. Nothing can inherit from an Individual.')
 				errors += 1
@@ -150,6 +188,8 @@ class MObject(PO, at.AttrOwner, at.AttrObserver): #, ModelObserver):
 		if len(self.relations) > 0:
 			self.tgmodel.logger.write(f'After sending notifyNodeDeletion to relations, they should all have deleted themselves and removed themselves from the list. Still have {self.relations}', level="error")
 		self.relations = None
+		self._isaParents = None
+		self._isaChildren = None
 
 		#tell the container
 		self.tgmodel.unregister(self)
@@ -165,8 +205,8 @@ class MObject(PO, at.AttrOwner, at.AttrObserver): #, ModelObserver):
 		will construct the Element itself.
 		"""
 		elem = super().serializeXML()
-		elem.set('tgmodel', self.tgmodel.idServer.getIDString(self.tgmodel.id))
-		elem.set('class', type(self).__name__)
+		elem.set('tgmodel', self.tgmodel._idString)
+		elem.set('class', self._className)
 		self.serializeXMLAttrs(elem) # subclasses my change the say Attributes are represented
 		return elem
 
@@ -184,11 +224,10 @@ class MObject(PO, at.AttrOwner, at.AttrObserver): #, ModelObserver):
 		Implementors should call *super().xmsRestore()* at some point.
 		"""
 		super().unserializeXML(elem, addrServer)
-		attrsElem = elem.find('Attributes')
-		if attrsElem:
+		attrsElem = elem.find(_ATTRS_TAG)
+		if attrsElem is not None:
 			attrs = self.makeObject(attrsElem, addrServer, Attributes)
-			for k,v in attrs.attrs.items():
-				self.attrs.attrs[k] = v
+			self.attrs.attrs.update(attrs.attrs)
 		
 	### ATTRIBUTES #######################################################################
 
@@ -196,10 +235,7 @@ class MObject(PO, at.AttrOwner, at.AttrObserver): #, ModelObserver):
 		top = self.getTop()
 		if self == top:
 			return []
-		ret = []
-		for r in self.relations:
-			if r.isIsa and self == r.fromNode:
-				ret.append(r.toNode.attrs)
+		ret = [p.attrs for p in self._isaParents]
 		if len(ret) == 0:
 			ret = [top.attrs]
 		return ret
@@ -220,7 +256,7 @@ class MObject(PO, at.AttrOwner, at.AttrObserver): #, ModelObserver):
 	def addObserver(self, observer:ModelObserver):
 		if not isinstance(observer, ModelObserver):
 			raise TypeError(f'MObject.addObserver(): argument of type {type(observer).__name__} is not a ModelObserver.')
-		self.observers.append(observer)
+		self.observers.add(observer)
 		
 	def removeObserver(self, observer:ModelObserver):
 # 		if self._deleted: return
@@ -228,66 +264,107 @@ class MObject(PO, at.AttrOwner, at.AttrObserver): #, ModelObserver):
 # 			self.observers.remove(observer)
 # 		else:
 # 			self.tgmodel.logger.write(f'called with an unregistered observer "{observer}" of type {type(observer).__name__}.', level="warning")
-		try:
-			if self.observers is not None: # need this check for the case of self is deleting
-				self.observers.remove(observer)
-		except Exception as ex:
-			self.tgmodel.logger.write(f'Unexpected exception. Probably called with an unregistered observer "{observer}" of type {type(observer).__name__}.', level="warning", exception=ex)
+		if self.observers is not None: # need this check for the case of self is deleting
+			self.observers.discard(observer) # unregistered observers are silently ignored, as WeakList.remove() did
 		
 	def notifyObservers(self, op, info=None): #, observable=None):
+		"""
+		Calls *notifyModelChanged()* on all the observers. The observers are iterated
+		from a tuple copy of *self.observers*, so observers may remove themselves during
+		the notification. The copy is not kept: it would keep observers alive that the
+		*WeakSet* would otherwise drop.
+		"""
 		if self.observers is not None:
-			deletions = []
-			obs = list(self.observers) # copy. might be deleting going on during the process...
-			for o in obs:
+			for o in tuple(self.observers):
 				try:
 					o.notifyModelChanged(self, op, info=info)
 				except Exception as ex:
 					self.tgmodel.logger.write(f'Exception in call to notifyModelChanged for observer "{o}"', level="warning", exception=ex)
-					if hasattr(o, "_deleted") and o._deleted:
-						deletions.append(o)
+					if hasattr(o, "_deleted") and o._deleted and self.observers is not None:
+						self.observers.discard(o)
 						self.tgmodel.logger.write(f'    - object had been marked as deleted, so removing it from observers list.', level="warning")
-			for d in deletions:
-				self.observers.remove(d)
 			
 	### Semantics ########################################################################
 	
 	def isa(self, nodeType=None) -> Union[bool, list]:
 		"""
 		Check if this *MObject* is an isa-decendent of *nodeType* as related through
-		some chain of isa-relations. Or, if *nodeType* is *None*, then return a tree-list
+		some chain of isa-relations. Or, if *nodeType* is *None*, then return a list
 		of ALL isa-supertypes of this *MObject*.
 	
 		:param nodeType: The *MObject* or a list of *MObjects* to serve a type representation
 			or None which the following interpretation:
-			* None: return a tree-list of all the isa-parents of this *MObject*. You can
-			flatten this tree-list to a simple list using *treeFlatten()*\ .
+			* None: return a flat list of this *MObject* followed by all of its isa-ancestors
+			(depth-first, each ancestor appearing once).
 			* *MObject*: return True iff *nodeType* is a isa-parent of this *MObject*.
 			* *[MObject]*: return True iff EVERY element of *nodeType* is a isa-parent of this *MObject*.
 		:type: nodetype: Optional[Union[Self, List[Self]]]
-		:return: a bool or a tree-list as above. Type: Union[bool, List[Self]]
+		:return: a bool or a list as above. Type: Union[bool, List[Self]]
 		"""
 		if nodeType is None:
-			if self in [self.tgmodel.topNode, self.tgmodel.topRelation]: return [self]
-			ret = [self]
-			for r in self.relations:
-				if r.isIsa and r.fromNode is self:
-					children = r.toNode.isa()
-					ret += children
-			return ret #[self, ret] if len(ret)>0 else [self]
-		elif isinstance(nodeType, list):
+			return self._isaAncestors()
+		ancestors = self.ancestorIds()
+		if isinstance(nodeType, list):
 			for nt in nodeType:
-				if not self.isa(nt):
+				if id(nt) not in ancestors or not issubclass(type(self), type(nt)):
 					return False
 			return True
-		else:
-			if not issubclass(type(self), type(nodeType)): return False
-			if nodeType==self: return True
-			if self in [self.tgmodel.topNode, self.tgmodel.topRelation]: return False 
-			for r in self.relations:
-				if r.isIsa and r.fromNode is self:
-					if r.toNode.isa(nodeType):
-						return True
-			return False
+		return id(nodeType) in ancestors and issubclass(type(self), type(nodeType))
+		
+	def flatAncestors(self) -> list:
+		"""
+		As *isa(None)*, but the list is cached until an isa-relation from this object or
+		one of its isa-ancestors is added or deleted, so callers must not modify it.
+		"""
+		ret = self._ancestorsCache
+		if ret is None:
+			ret = self._ancestorsCache = self._isaAncestors()
+		return ret
+		
+	def ancestorIds(self) -> frozenset:
+		"""
+		The *id()*\ s of the objects in *flatAncestors()*, cached along with it, so that
+		*isa()* is a set lookup rather than a walk up the isa-relations.
+		"""
+		ret = self._ancestorIdsCache
+		if ret is None:
+			ret = self._ancestorIdsCache = frozenset(id(a) for a in self.flatAncestors())
+		return ret
+		
+	def _invalidateAncestors(self):
+		"""
+		Our isa-parents changed: drop the *flatAncestors()* and *ancestorIds()* caches of this
+		object and all of its isa-descendants. Nothing else's ancestors can have changed, so
+		their caches survive (in particular, across all the isa-relations added while loading a model).
+		"""
+		stack = [self]
+		seen = {id(self)}
+		while stack:
+			o = stack.pop()
+			o._ancestorsCache = None
+			o._ancestorIdsCache = None
+			for c in o._isaChildren or (): # (None once o is deleted)
+				if id(c) not in seen:
+					seen.add(id(c))
+					stack.append(c)
+		
+	def _isaAncestors(self) -> list:
+		"""
+		The implementation of *isa(None)*: *self* followed by all its isa-ancestors in
+		depth-first order, each appearing once even if it is reachable along several isa-paths.
+		"""
+		topNode, topRelation = self.tgmodel.topNode, self.tgmodel.topRelation
+		ret = []
+		seen = set()
+		stack = [self]
+		while stack:
+			o = stack.pop()
+			if id(o) in seen: continue
+			seen.add(id(o))
+			ret.append(o)
+			if o is not topNode and o is not topRelation:
+				stack.extend(reversed(o._isaParents)) # reversed so parents pop in their original order
+		return ret
 		
 	def isparent(self, nodeType=None) -> Union[bool, list]:
 		"""
@@ -304,25 +381,22 @@ class MObject(PO, at.AttrOwner, at.AttrObserver): #, ModelObserver):
 		:return: a bool or a tree-list as above. Type: Union[bool, List[Self]]
 		"""
 		if nodeType is None:
-			ret = []
-			for r in self.relations:
-				if r.isIsa and r.fromNode is self:
-					ret.append(r.toNode)
-			return ret
+			return self._isaParents.copy()
 		elif isinstance(nodeType, list):
+			parents = {id(p) for p in self._isaParents}
 			for nt in nodeType:
-				if not self.isparent(nt):
+				assert type(nt) is type(self)
+				if id(nt) not in parents:
 					return False
 			return True
 		else:
-			assert type(nodeType) == type(self)
-			for r in self.relations:
-				if r.isIsa and r.fromNode is self:
-					if r.toNode is nodeType:
-						return True
+			assert type(nodeType) is type(self)
+			for p in self._isaParents:
+				if p is nodeType:
+					return True
 			return False
 		
-	def isRelatedTo(self, relType, toNode=None, _omit:set=set()) -> set:
+	def isRelatedTo(self, relType, toNode=None, _omit:frozenset=frozenset()) -> set:
 		"""
 		Check if this *MObject* is related to *nodeType* as related through
 		some chain of relations that are subtypes of *reltype*. Or, if *nodeType* is *None*, 
@@ -344,30 +418,41 @@ class MObject(PO, at.AttrOwner, at.AttrObserver): #, ModelObserver):
 			* *MObject*: return True iff *toNode* is related to this *MObject* through
 			some chain of relations that are subtypes of *relType*\ .
 		:type toNode: Self
-		:param _omit: Should never be used. Used ONLY by relational properties to prevent
-			infinite recursion in following relation chains.
+		:param _omit: Should never be used. Nodes whose transitive relations are not
+			followed.
 		:return: Depends on the *ToNode* argument, as above. Type: set[Self]
 		"""
-		from tygra.mrelations import MRelation
-		assert isinstance(relType, MRelation), f'MObject.isRelatedTo() [MObject]: Argument relType must be a MRelation or list of MRelations, but got argument of type {type(relType).__name__}.'
+		if _MRelation is None: _importRelationClasses()
+		assert isinstance(relType, _MRelation), f'MObject.isRelatedTo() [MObject]: Argument relType must be a MRelation or list of MRelations, but got argument of type {type(relType).__name__}.'
 		if toNode: # return a bool
-			for r in self.relations:
-				if r.isa(relType):
-					if r.fromNode is self and r.toNode is toNode: return True
-					for behaviour in r.properties:
-						if behaviour.isRelated(relType, self, r, toNode, _omit=_omit.union([toNode])):
-							return True
-			return False
-		else: # return a tree list
-			result = []
-			for r in self.relations:
-				if r.isa(relType):
-					if r.fromNode is self: 
-						result.append(r.toNode)
-					for behaviour in r.properties:
-						related = behaviour.isRelated(relType, self, r, _omit=_omit)#.union(result))
-						if len(related): result += related
-			return set(result) 
+			blocked = _omit.union([toNode])
+		else: # return a set
+			blocked = _omit
+			result = set()
+		frontier = deque([self]) # nodes reached through transitive relations, searched breadth-first
+		visited = {self}
+		popleft, push = frontier.popleft, frontier.append
+		while frontier:
+			node = popleft()
+			follow = node not in blocked
+			for r in node.relations:
+				if not r.isa(relType): continue
+				to = r.toNode
+				if r.fromNode is node:
+					if toNode:
+						if to is toNode: return True
+					else:
+						result.add(to)
+				for behaviour in r.properties:
+					if behaviour.isTransitive: # follow the chain here rather than recursing through the behaviour
+						if follow and to not in visited:
+							visited.add(to)
+							push(to)
+					elif toNode:
+						if behaviour.isRelated(relType, node, r, toNode, _checked=True): return True
+					else:
+						result.update(behaviour.isRelated(relType, node, r, _checked=True))
+		return False if toNode else result
 	
 	@abstractmethod	
 	def getTop(self):
@@ -393,40 +478,62 @@ class MObject(PO, at.AttrOwner, at.AttrObserver): #, ModelObserver):
 		and all of the isa-child MObjects connected to it via isa-relations.
 		"""
 		assert value is not None
-		self.notifyObservers('mod attr', info=(name, value))#, observable=attrsObject) # view objects
-		for r in self.relations:
-			if r.isIsa and r.toNode is self:
-				r.fromNode.notifyAttrChanged(attrsObject, name, value)
+		self._notifyIsaDescendants('mod attr', (name, value))
+
+	def notifyAttrsChanged(self, attrsObject, items:List[Tuple[str,Any]]):
+		"""
+		As *notifyAttrChanged()*, but for several (name, value) pairs at once: the observers
+		of this object and of each isa-descendant get a single 'mod attrs' notification
+		with *items* as its info.
+		"""
+		assert all(value is not None for _, value in items)
+		self._notifyIsaDescendants('mod attrs', items)
+		
+	def _notifyIsaDescendants(self, op:str, info):
+		"""
+		Send *op* to the observers of this object and of each of its isa-descendants.
+		Descendants reachable by more than one isa-path (diamonds) are notified only once.
+		"""
+		stack = [self]
+		seen = {id(self)}
+		while stack:
+			o = stack.pop()
+			o.notifyObservers(op, info=info)#, observable=attrsObject) # view objects
+			for c in reversed(o._isaChildren): # reversed so children pop in their original order
+				if id(c) not in seen:
+					seen.add(id(c))
+					stack.append(c)
 
 	def notifyModelChanged(self, modelObj, modelOperation:str, info:Optional[any]=None):
 		self.tgmodel.logger.write(f'operation "{modelOperation}".', level='debug') 
-		unhandled = False
 # 		if modelOperation == 'del': 
 # 			pass
 		if modelOperation == 'mod attr':
 			if isinstance(info, list) and len(info) == 2:
 				# modelObj should be one we isa-inherit from
 				for r in self.relations:
-					if r.isIsa() and r.toNode is modelObj:
+					if r.isIsa and r.toNode is modelObj:
 						self.attrs.ping(info[0])
 						self.notifyObservers(modelOperation, info)
 						break
 			else:
 				self.tgmodel.logger.write(f'operation "{modelOperation}" expected a 2-list as info parameter, got info={info} of type {type(info).__name__}', level="error")
-		if modelOperation in ['mod attr', 'add rel', 'del rel', 'del']:
-# 			self.notifyObservers(modelOperation, info, observable=modelObj)
-			pass
-		else:
+		elif modelOperation not in _KNOWN_OPS:
 			raise NotImplementedError(f'operation "{modelOperation}" not implemented.') 
-		if unhandled:
-			self.tgmodel.logger.write(f'operation "{modelOperation}" not implemented.', level="warning") 
 	
 	def notifyViewDeletion(self, viewObj):
 		# TODO: fill out implementation of notifyViewDeletion() (authorizing?)
 		self.delete()
 
 	def addRelation(self, relation):
-		self.relations.append(relation)
+		if relation in self.relations: 
+			return # we're both ends of this relation and have already added it
+		self.relations.add(relation)
+		if relation.isIsa:
+			if relation.fromNode is self: 
+				self._isaParents.append(relation.toNode)
+				self._invalidateAncestors()
+			if relation.toNode   is self: self._isaChildren.append(relation.fromNode)
 		self.notifyObservers('add rel', relation)
 		if relation.isIsa and relation.fromNode is self: # we need to assure that all the attributes are reset correctly
 			for k in self.attrs.keys():
@@ -437,7 +544,15 @@ class MObject(PO, at.AttrOwner, at.AttrObserver): #, ModelObserver):
 		Called by MRelations for thier toNodes and fromNodes when they are deleting .
 		"""
 		if relation in self.relations:
-			self.relations.remove(relation)
+			self.relations.discard(relation)
+			if relation.isIsa:
+				if relation.fromNode is self and relation.toNode in self._isaParents: 
+					self._isaParents.remove(relation.toNode)
+					self._invalidateAncestors()
+				if relation.toNode is self and relation.fromNode in self._isaChildren: 
+					self._isaChildren.remove(relation.fromNode)
+		elif relation.fromNode is self and relation.toNode is self:
+			return # we're both ends of this relation and have already been notified
 		else:
 			self.tgmodel.logger.write(f'called with an unregistered relation {relation}.', level="warning")
 			
@@ -447,9 +562,9 @@ class MObject(PO, at.AttrOwner, at.AttrObserver): #, ModelObserver):
 		if relation.isIsa and relation.fromNode is self: 
 			relation.toNode.removeObserver(self)
 			# if there is no other supertype, then make the supertype topNode or topRelation
-			if len([r for r in self.relations if r.isIsa and r.fromNode is self]) == 0 and not self._deleted:
-				from tygra.mrelations import Isa
-				Isa(self.tgmodel, self, self.tgmodel.topRelation if self.isRelation() else self.tgmodel.topNode, idServer=self.tgmodel)
+			if not self._isaParents and not self._deleted:
+				if _Isa is None: _importRelationClasses()
+				_Isa(self.tgmodel, self, self.tgmodel.topRelation if self.isRelation() else self.tgmodel.topNode, idServer=self.tgmodel)
 		if relation.isIsa and relation.fromNode.isRelation():
 			# TODO: it's possible that there was ANOTHER isa connected that won't be connected anymore...
 			relation.fromNode.toNode.removeObserver(relation.fromNode) 
@@ -23,18 +23,16 @@
 from tygra.mnodes import MNode
 from tygra.mobjects import MObject
 import xml.etree.ElementTree as et
-from ast import literal_eval
 from abc import ABC, abstractmethod # Abstract Base Class
 from typing import Any, Optional, Union, Tuple, List, Dict
-from tygra.util import AddrServer, IDServer, treeFlatten
+from tygra.util import AddrServer, IDServer
 from tygra.attributes import Attributes, AttrOwner
 import tygra.app as app
 
 class MRelation(MObject):
-
-	@property
-	def isIsa(self):
-		return False
+	__slots__ = ('fromNode', 'toNode')
+	_kind = 'R'
+	isIsa = False # a plain class attribute, not a property: it's tested in loops over relations
 		
 	@property
 	def system(self) -> bool:
@@ -70,10 +68,11 @@ class MRelation(MObject):
 #		self.validateReferents() # may raise exceptions
 		if self.validate() > 0:
 			raise AttributeError("MRelation._post__init__({self}): Validation failed.")
-		self.fromNode.addRelation(self)
-		self.toNode.addRelation(self)
-		assert self in self.fromNode.relations
-		assert self in self.toNode.relations
+		frm, to = self.fromNode, self.toNode
+		frm.addRelation(self)
+		to.addRelation(self)
+		assert self in frm.relations
+		assert self in to.relations
 		
 	def validate(self) -> int:
 		errCount = 0
@@ -83,34 +82,37 @@ class MRelation(MObject):
 
 	def validateReferents(self) -> bool:
 		errCount = 0
-		if not ((isinstance(self.fromNode, MNode) and isinstance(self.toNode, MNode)) or \
-		        (isinstance(self.fromNode, MRelation) and isinstance(self.toNode, MRelation))): 
+		frm, to = self.fromNode, self.toNode
+		logger = self.tgmodel.logger
+		kind = getattr(frm, '_kind', None) # (the ends might still be unresolved id strings)
+		if kind is None or kind != getattr(to, '_kind', None): 
 #			raise TypeError(f'MRelation.validateReferents(): {type(self.fromNode)}, {type(self.toNode)} | fromNode ({type(self.fromNode).__name__}) and toNode ({type(self.toNode).__name__}) must be either both MNodes or both MRelations.')
-			self.tgmodel.logger.write(f'{type(self.fromNode)}, {type(self.toNode)} | fromNode ({type(self.fromNode).__name__}) and toNode ({type(self.toNode).__name__}) must be either both MNodes or both MRelations.', level="error")
+			logger.write(f'{type(frm)}, {type(to)} | fromNode ({type(frm).__name__}) and toNode ({type(to).__name__}) must be either both MNodes or both MRelations.', level="error")
 			return 1
 		
-		for parent in self.isparent(): # to- and from- nodes must be subtypes of the parents' to- and from- nodes.
-			if not self.toNode.isa(parent.toNode): 
+		parents = self._isaParents
+		if parents: # one ancestor set per end rather than an isa() walk per parent
+			toAncestors = to.ancestorIds()
+			frmAncestors = frm.ancestorIds()
+		for parent in parents: # to- and from- nodes must be subtypes of the parents' to- and from- nodes.
+			if id(parent.toNode) not in toAncestors: 
 #				raise TypeError(f'MRelation.validateReferents [{self}]: toNode {self.toNode} must be a subtype of {parent.toNode}.')
-				self.tgmodel.logger.write(f'toNode {self.toNode} must be a subtype of {parent.toNode}.', level="error")
+				logger.write(f'toNode {to} must be a subtype of {parent.toNode}.', level="error")
 				errCount += 1
-			if not self.fromNode.isa(parent.fromNode): 
+			if id(parent.fromNode) not in frmAncestors: 
 #				raise TypeError(f'MRelation.validateReferents [{self}]: fromNode {self.fromNode} must be a subtype of {parent.fromNode}.')
-				self.tgmodel.logger.write(f'fromNode {self.fromNode} must be a subtype of {parent.fromNode}.', level="error")
+				logger.write(f'fromNode {frm} must be a subtype of {parent.fromNode}.', level="error")
 				errCount += 1
 		return errCount
 
 	### DESTRUCTOR #######################################################################
 	
 	def delete(self):
-		try: 
-			self.fromNode.notifyRelationDeletion(self)
-		except Exception as ex: 
-			self.tgmodel.logger.write(f'Unexpected exception calling notifyRelationDeletion() on fromNode "{self.fromNode}"', level='error', exception=ex)
-		try: 
-			self.toNode  .notifyRelationDeletion(self)
-		except Exception as ex: 
-			self.tgmodel.logger.write(f'Unexpected exception calling notifyRelationDeletion() on toNode "{self.toNode}"', level='error', exception=ex)
+		for side, end in (('fromNode', self.fromNode), ('toNode', self.toNode)):
+			try: 
+				end.notifyRelationDeletion(self)
+			except Exception as ex: 
+				self.tgmodel.logger.write(f'Unexpected exception calling notifyRelationDeletion() on {side} "{end}"', level='error', exception=ex)
 		self.fromNode = None
 		self.toNode = None
 		super().delete()
@@ -125,38 +127,23 @@ class MRelation(MObject):
 		"""
 		elem = super().serializeXML()
 		assert isinstance(self.fromNode, MObject), f'Unexpected type for fromNode: {type(self.fromNode).__name__}, "{self.fromNode}".'
-		elem.set('fromNode', str(self.fromNode.idString))
-		elem.set('toNode', str(self.toNode.idString))
+		elem.set('fromNode', self.fromNode._idString)
+		elem.set('toNode', self.toNode._idString)
 # 		elem.set('isa', str(self._isa))
 		return elem
 
 	@classmethod
 	def getArgs(cls, elem: et.Element, addrServer:AddrServer) -> Tuple[List[Any], Dict[str, Any]]:
-		args = []
-		kwargs = dict()
+		def resolve(key):
+			idStr = elem.get(key)
+			if not idStr: return None
+			try: # Node might not have been loaded yet.
+				return addrServer.idLookup(idStr)
+			except Exception: # The node hasn't been loaded, so we leave it as the ID string for the constructor to look it up later
+				return idStr
 		tgmodel = addrServer.idLookup(elem.get('tgmodel'))
-		args.append(tgmodel)
-
-		fromNode = elem.get('fromNode')
-		try: # Node might not have been loaded yet.
-			fromNode = addrServer.idLookup(fromNode) if fromNode!=None and fromNode!="" else None
-		except: # The node hasn't been loaded, so we leave it as the ID string for the constructor to look it up later
-			pass
-		args.append(fromNode)
-
-		toNode = elem.get('toNode')
-		try: # Node might not have been loaded yet.
-			toNode = addrServer.idLookup(toNode) if toNode!=None and toNode!="" else None
-		except: # The node hasn't been loaded, so we leave it as the ID string for the constructor to look it up later
-			pass
-		args.append(toNode)
-
 		idStr = elem.get('id')
-		id = IDServer.getLocalID(idStr) if idStr else None
-		kwargs["_id"] = id
-		kwargs["idServer"] = tgmodel
-		
-		return args, kwargs
+		return [tgmodel, resolve('fromNode'), resolve('toNode')], {"_id": IDServer.getLocalID(idStr) if idStr else None, "idServer": tgmodel}
 	
 	def unserializeXML(self, elem: et.Element, addrServer:AddrServer):
 		"""
@@ -173,7 +160,7 @@ class MRelation(MObject):
 	### EVENT HANDLING ###################################################################
 	
 	def notifyNodeDeletion(self, node):
-		if node in [self.toNode, self.fromNode]:
+		if node is self.toNode or node is self.fromNode:
 			self.delete()
 		else:
 			self.tgmodel.logger.write(f'Got notification for node "{node}" that isn\'t a fromNode or toNode.', level="warning")
@@ -241,16 +228,17 @@ class MRelation(MObject):
 	### Debugging support ################################################################
 	
 	def __str__(self):
-		try:
-			label = self.attrs["label"]
-		except:
-			label = '<no label>'
-		try:
-			toNode =   '<no toNode>'   if self.toNode   is None else self.toNode.idString
-			fromNode = '<no fromNode>' if self.fromNode is None else self.fromNode.idString
-			return f'({type(self).__name__} [{self.idString}, "{label}", fromNode={fromNode}, toNode={toNode}])'
-		except:
-			return f'({type(self).__name__} [{self.idString}, "{label}"]{" *DELETED*" if self._deleted else ""})'
+		# This may be called part way through construction (eg: in log messages), when
+		# slots may be still unset and the ends may still be id strings (see getArgs()).
+		attrs = getattr(self, 'attrs', None)
+		label = '<no label>' if attrs is None else attrs.get("label", default='<no label>')
+		toNode = getattr(self, 'toNode', None)
+		fromNode = getattr(self, 'fromNode', None)
+		toNode =   '<no toNode>'   if toNode   is None else getattr(toNode,   'idString', toNode)
+		fromNode = '<no fromNode>' if fromNode is None else getattr(fromNode, 'idString', fromNode)
+		idString = getattr(self, '_idString', '<no id>')
+		deleted = " *DELETED*" if getattr(self, '_deleted', False) else ""
+		return f'({type(self).__name__} [{idString}, "{label}", fromNode={fromNode}, toNode={toNode}]{deleted})'
 			
 
 	def __repr__(self):
@@ -266,6 +254,7 @@ class Isa(MRelation):
 	object actually IS *self.tgmodel.isa*.
 	This avoids endless recursion in an isa relation being isa to isa.
 	"""
+	__slots__ = ()
 
 	class IsaAttributes(Attributes):
 		def __init__(self, owner:Optional[AttrOwner]=None, top=None):
@@ -274,11 +263,9 @@ class Isa(MRelation):
 		def getParents(self):
 			return [self.top]
 				
-	attrs:Optional[IsaAttributes] = None
+	attrs:Optional[IsaAttributes] # (only an annotation: a class-level value would hide MObject's *attrs* slot)
 		
-	@property
-	def isIsa(self):
-		return True
+	isIsa = True
 		
 	commonAttrs = None #:Optional[Self.IsaAttributes]
 		
@@ -289,7 +276,7 @@ class Isa(MRelation):
 	def __init__(self, tgmodel, frm:MNode, to:MNode, idServer:IDServer=None, _id:Optional[int]=None):
 		super().__init__(tgmodel, frm, to, typ=None, idServer=idServer, _id=_id)
 		
-		if hasattr(self.tgmodel, "isa"): # if the model container has isa, we have the mother ISA existing and this instance isn't it.
+		if self.tgmodel._isaReady: # if the model container has isa, we have the mother ISA existing and this instance isn't it.
 			if Isa.commonAttrs is None:
 				Isa.commonAttrs = Isa.IsaAttributes(owner=self, top=self.tgmodel.isa.attrs)
 			self.attrs.owner = None
@@ -297,14 +284,20 @@ class Isa(MRelation):
 			
 	def _post__init__(self, addrServer:Optional[AddrServer]=None):
 		super()._post__init__(addrServer)
-		toAncestors = treeFlatten(self.toNode.isa())[1:]# ancestors without the to itself
+		frm, to = self.fromNode, self.toNode
+		parents = {id(p) for p in frm._isaParents}
+		# ancestors (without the to itself) that our fromNode also has a direct isa-relation to
+		toAncestors = [t for t in to.flatAncestors() if id(t) in parents and t is not to]
 		deletions = []
-		for t in toAncestors:
-			for r in self.fromNode.relations:
-				if r.isIsa and r.toNode is t:
-					deletions.append(r)
+		if toAncestors: # usually not, so we don't scan the fromNode's relations
+			isaByTarget = {} # our fromNode's isa-relations, keyed by their toNode
+			for r in frm.relations:
+				if r.isIsa:
+					isaByTarget.setdefault(r.toNode, []).append(r)
+			for t in toAncestors:
+				deletions += isaByTarget.get(t, ())
 		for r in deletions:
-			self.tgmodel.logger.write(f'Deleting redundant relation from "{self.fromNode.attrs["label"]}" ({self.fromNode.idString}) to "{r.toNode.attrs["label"]}" ({r.toNode.idString})', level="info")
+			self.tgmodel.logger.write(lambda: f'Deleting redundant relation from "{frm.attrs["label"]}" ({frm.idString}) to "{r.toNode.attrs["label"]}" ({r.toNode.idString})', level="info")
 			r.delete()
 
 	def validateReferents(self) -> int:
@@ -313,14 +306,15 @@ class Isa(MRelation):
 
 		# Sanity checks
 		# check for redundancy (this relation)
-		frmAncestors = treeFlatten(self.fromNode.isa())[1:] # ancestors without the frm itself
-		if self.toNode in frmAncestors and not self.toNode is self.fromNode: # and frmAncestors[0] != tgmodel.topNode:
+		# (flatAncestors() starts with the object itself, so "is not" stands in for slicing that off)
+		frm, to = self.fromNode, self.toNode
+		frmAncestors = frm.flatAncestors()
+		if not to is frm and to in frmAncestors: # and frmAncestors[0] != tgmodel.topNode:
 #			raise TypeError(f'Isa.validateReferents(): "{self.fromNode.attrs["label"]}" {self.fromNode.idString} is already a subtype of "{self.toNode.attrs["label"]}" {self.toNode.idString}. {frmAncestors}')
-			self.tgmodel.logger.write(f'{self.fromNode} is already a subtype of {self.toNode}. {frmAncestors}', level="error")
+			self.tgmodel.logger.write(f'{frm} is already a subtype of {to}. {frmAncestors[1:]}', level="error")
 			errCount += 1
 		# check for circularity
-		toAncestors = treeFlatten(self.toNode.isa())[1:]# ancestors without the to itself
-		if self.fromNode in toAncestors: # and toAncestors[0] != tgmodel.topNode:
+		if not frm is to and frm in to.flatAncestors(): # and toAncestors[0] != tgmodel.topNode:
 #			raise TypeError(f'Isa.validateReferents(): This relation would create a circular type hierarchy.')
 			self.tgmodel.logger.write(f'This relation would create a circular type hierarchy.', level="error")
 			errCount += 1
@@ -26,21 +26,39 @@ Created on Sep. 5, 2023
 #################################################################################
 
 import xml.etree.ElementTree as et
-from tkinter.filedialog import askopenfiles
-from typing import Optional, get_args, Union, Callable, TypeVar, Any, Generic, Type, Tuple, List, Dict
+from typing import Optional, Union, Callable, TypeVar, Any, Generic, Type, Tuple, List, Dict
 import tygra.app as app
 import os
+import tempfile
 import tkinter as tk
 import tkinter.ttk as ttk
-from collections import namedtuple
-import re
+from operator import attrgetter
 from tkinter import colorchooser
 from tygra.tooltip import CreateToolTip
-from pickle import FALSE
 import tygra.util as util
 
 T = TypeVar('T')
 
+# computed once rather than per Prefs object (expanduser() consults the environment)
+_PREFS_FILENAME = os.path.join(os.path.expanduser("~"), f'.{app.APP_SHORT_NAME.lower()}prefs.xml')
+_XML_TAG = f"{app.APP_SHORT_NAME.lower()}-prefs"
+
+# the python type of each fixed kind of Pref; the other kinds are "choices:..." (str)
+_KIND_TYPES:Dict[str, Type] = {"text": str, "int": int, "bool": bool}
+
+def _kindType(kind:str) -> Optional[Type]:
+	"""The python type for Pref *kind*, or None if *kind* isn't a valid kind."""
+	return str if kind.startswith("choices:") else _KIND_TYPES.get(kind)
+
+# tygra.typedgraphs imports this module, so these can only be bound on first use (see _importContainerClasses())
+_TygraContainer = None
+_TGView = None
+
+def _importContainerClasses():
+	global _TygraContainer, _TGView
+	from tygra.typedgraphs import TygraContainer, TGView
+	_TygraContainer, _TGView = TygraContainer, TGView
+
 class Pref(Generic[T], object):
 	def __init__(self, propertyName:str, owner:Any, kind:str, userName:Optional[str]=None, 
 				help:Optional[str]=None, validatorFunc:Optional[Callable[[Any],Any]]=None,
@@ -57,21 +75,16 @@ class Pref(Generic[T], object):
 		"""
 		self.owner = owner
 		self.propertyName = propertyName
-		if kind.startswith("choices:") or kind in ["text", "int", "bool"]:
+		self._get = attrgetter(propertyName) # see get()
+		kindType = _kindType(kind)
+		if kindType is not None:
 			self.kind = kind
 		else:
-			raise AttributeError("Pref.__init__(): Unknown kind: {kind}")
+			raise AttributeError(f"Pref.__init__(): Unknown kind: {kind}")
 		self.userName = propertyName if userName is None else userName
 		self.help = help
 		self.validatorFunc = validatorFunc
-		self.pythonType = pythonType
-		if self.pythonType is None:
-			if kind.startswith("choices:") or kind=="text":
-				self.pythonType = str
-			elif kind == "int":
-				self.pythonType = int
-			elif kind == "bool":
-				self.pythonType = bool
+		self.pythonType = kindType if pythonType is None else pythonType
 			
 		val = getattr(self.owner, self.propertyName) # may throw AttributeError
 		if self.pythonType is not None and not isinstance(val, self.pythonType):
@@ -88,14 +101,30 @@ class Pref(Generic[T], object):
 		:throws AttributeError: if *self.property* is not one of *self.owner*\ 's actual properties.
 		:throws TypeError: If *value* does not pass :meth:`Pref.validate`\ .
 		"""
-		oldVal = getattr(self.owner, self.propertyName) # may throw AttributeError
+		oldVal = self.get() # may throw AttributeError
 		if value is not None:
-			validatedValue = self.validate(value)
-			if validatedValue is None:
-				raise TypeError(f'Prefs(value="{str(value)}":{type(value).__name__}): invalid value.')
-			setattr(self.owner, self.propertyName, validatedValue)
+			self.set(value)
 		return oldVal
 	
+	def get(self) -> T:
+		"""
+		:return: The value of the property in the owner object.
+		:throws AttributeError: if *self.property* is not one of *self.owner*\ 's actual properties.
+		"""
+		return self._get(self.owner)
+	
+	def set(self, value:T):
+		"""
+		Set the property in the owner object to *value* (as validated by :meth:`Pref.validate`\ ).
+		Unlike :meth:`Pref.__call__`\ , this doesn't read the old value.
+		
+		:throws TypeError: If *value* does not pass :meth:`Pref.validate`\ .
+		"""
+		validatedValue = self.validate(value)
+		if validatedValue is None:
+			raise TypeError(f'Prefs(value="{str(value)}":{type(value).__name__}): invalid value.')
+		setattr(self.owner, self.propertyName, validatedValue)
+	
 	def validate(self, value:T) -> Optional[T]:
 		"""
 		:param value: The value to check for validity.
@@ -110,10 +139,11 @@ class Pref(Generic[T], object):
 		value is the *str* "5", it might return the *int* 5. 
 		"""
 		if self.validatorFunc is None:
-			if isinstance(value, self.pythonType):
+			pythonType = self.pythonType
+			if type(value) is pythonType or isinstance(value, pythonType): # (exact type first: the usual case)
 				return value
 			try:
-				value = self.pythonType(value)
+				value = pythonType(value)
 				return value
 			except:
 				return None
@@ -126,7 +156,7 @@ class Pref(Generic[T], object):
 		:param value: The value to test change.
 		:return: True iff *value* is different (!=) than the owner's value
 		"""
-		return value != self()
+		return value != self.get()
 	
 	def serialize(self) -> str:
 		"""
@@ -136,7 +166,7 @@ class Pref(Generic[T], object):
 		This method does **not** have to worry about XML escapes for xml serialization: That's taken care
 		of by the :meth:`Prefs.save` , :meth:`Prefs.getPrefs` and :meth:`Prefs.getPref` methods in :class:`Prefs`\ .
 		"""
-		return str(self())
+		return str(self.get())
 		
 	def unserialize(self, value:str) -> Any:
 		"""
@@ -156,7 +186,7 @@ class Pref(Generic[T], object):
 		
 		if ret is None:
 			raise ValueError(f'Pref.unserialize("{value}"): Invalid value.')
-		self(ret)
+		setattr(self.owner, self.propertyName, ret) # already validated: set() would validate it again
 		return ret
 	
 class ViewData:
@@ -175,15 +205,17 @@ class Prefs:
 	classdocs
 	'''
 			
-	def __init__(self):#, owner):
+	def __init__(self):
 		'''
 		Constructor
 		'''
-#		self.owner = owner
-#		self.openFiles:List[FileData] = []
-		self.prefsFileName = f'{os.path.expanduser("~")}/.{app.APP_SHORT_NAME.lower()}prefs.xml'
-		self.xmlTag = f"{app.APP_SHORT_NAME.lower()}-prefs"
-		self.prefs:List[Pref] = []
+		self.prefsFileName = _PREFS_FILENAME
+		self.xmlTag = _XML_TAG
+		self.prefs:List[Pref] = [] # in bind() order, for saving and the editor
+		self._prefsByName:Dict[str, Pref] = {} # the same Prefs, keyed by propertyName
+		self._openFiles:List[FileData] = [] # collected by read(); see getOpenFilesData()
+		self._rootChildren:Dict[str, et.Element] = {} # self.root's children by tag, collected by read(); see getPref()
+		self._savedContent:Optional[tuple] = None # what the prefs file holds, as last read or written; see save()
 		
 	def save(self):
 		"""
@@ -191,112 +223,162 @@ class Prefs:
 		dialog to give the user a chance to save the file before closing. Then
 		saves each of files and the window geometry for it's file window and
 		each of its open view windows.
+		The prefs file itself isn't rewritten if its content would be unchanged.
 		"""
-		from tygra.typedgraphs import TygraContainer, TGView
+		if _TygraContainer is None: _importContainerClasses()
+		TygraContainer, TGView = _TygraContainer, _TGView
 		topElem = et.Element(self.xmlTag)
 		topElem.set("version", "0")
 		
 		# open files
-		openFiles = et.Element("openfiles")
+		openFiles = et.SubElement(topElem, "openfiles")
+		filesContent = []
 		for tgc in TygraContainer._instances:
 			tgc.saveFile() 
 			if tgc.filename is None:
 				continue
-			fileInfo = et.Element("file")
-			fileInfo.set("name", os.path.abspath(tgc.filename))
-			fileInfo.set("geometry", tgc.geometry())
+			fileName, fileGeometry = os.path.abspath(tgc.filename), tgc.geometry()
+			fileInfo = et.SubElement(openFiles, "file", {"name": fileName, "geometry": fileGeometry})
+			viewsContent = []
 			for dirViewID, dirViewRec in tgc.getViewsFromDirectory().items():
 				if isinstance(dirViewRec.viewData, TGView):
-					viewInfo = et.Element("openview")
-					viewInfo.set("id", dirViewID)
-					viewInfo.set("geometry", dirViewRec.viewData.winfo_toplevel().geometry())
-					fileInfo.append(viewInfo)
-			openFiles.append(fileInfo)
-		topElem.append(openFiles)
+					viewGeometry = dirViewRec.viewData.winfo_toplevel().geometry()
+					et.SubElement(fileInfo, "openview", {"id": dirViewID, "geometry": viewGeometry})
+					viewsContent.append((dirViewID, viewGeometry))
+			filesContent.append((fileName, fileGeometry, tuple(viewsContent)))
 		
 		# prefs
+		prefsContent = []
 		for pref in self.prefs:
-			elem = et.Element(pref.propertyName)
-			elem.text = util.xmlEscape(pref.serialize())
-			topElem.append(elem)
+			text = pref.serialize()
+			et.SubElement(topElem, pref.propertyName).text = util.xmlEscape(text)
+			prefsContent.append((pref.propertyName, text))
 		
+		content = (tuple(filesContent), tuple(prefsContent))
+		if content == self._savedContent and os.path.isfile(self.prefsFileName):
+			return
 		tree = et.ElementTree(element=topElem)
 		et.indent(tree, space='  ', level=0)
-		tree.write(self.prefsFileName, xml_declaration=True, encoding="utf-8")
+		# write a temporary file and rename it over the old one, so an interrupted save can't
+		# leave a truncated prefs file behind
+		fd, tmpName = tempfile.mkstemp(prefix='.prefs.', suffix='.tmp', dir=os.path.dirname(self.prefsFileName))
+		try:
+			with os.fdopen(fd, 'wb') as f:
+				tree.write(f, xml_declaration=True, encoding="utf-8")
+				f.flush()
+				os.fsync(f.fileno())
+			os.replace(tmpName, self.prefsFileName)
+		except:
+			try: os.remove(tmpName)
+			except OSError: pass
+			raise
+		self._savedContent = content
 		
 
 	def read(self) -> et.Element:
 		if not os.path.isfile(self.prefsFileName):
 			raise FileNotFoundError(f'Prefs.read(): {self.prefsFileName} not found.')
 		else:
-			tree = et.parse(self.prefsFileName)
-			root = tree.getroot()
-			if root.tag != self.xmlTag:
-				raise TypeError(f'Prefs.read(): {self.prefsFileName} is not a {self.xmlTag} file.')
+			# One streaming pass: the prefs are set, and the open files and views collected, 
+			# as their elements end, rather than by walking the finished tree again.
+			openFiles:List[FileData] = []
+			openViews:List[ViewData] = []
+			root = None
+			rootChildren:Dict[str, et.Element] = {}
+			storedTexts:Dict[str, Optional[str]] = {} # the file's text of each pref that unserialized, for _savedContent
+			depth = 0
+			for event, elem in et.iterparse(self.prefsFileName, events=('start', 'end')):
+				if event == 'start':
+					if root is None: # the first event is the start of the root element
+						root = elem
+						if root.tag != self.xmlTag:
+							raise TypeError(f'Prefs.read(): {self.prefsFileName} is not a {self.xmlTag} file.')
+					depth += 1
+					continue
+				depth -= 1
+				tag = elem.tag
+				if depth == 1:
+					rootChildren.setdefault(tag, elem) # (like find(), the first one wins)
+				if depth == 1 and tag != "openfiles": # a pref: a direct child of the root
+					try:
+						self._unserialize(elem) # sets the property in the owner object
+					except:
+						storedTexts[tag] = None # rejected: save() must rewrite it
+					else:
+						# (a repeated tag is also something save() won't write back as it is)
+						storedTexts[tag] = util.xmlUnescape(elem.text) if tag not in storedTexts else None
+				elif tag == "openview":
+					viewData = ViewData()
+					viewData.id = elem.get("id")
+					viewData.geometry = elem.get("geometry")
+					openViews.append(viewData)
+				elif tag == "file":
+					fileData = FileData()
+					fileData.filename = elem.get("name")
+					fileData.geometry = elem.get("geometry")
+					fileData.openViews = openViews
+					openViews = []
+					openFiles.append(fileData)
+					elem.clear() # already captured, and getPrefs() skips "openfiles"
+			self._openFiles = openFiles
 			self.root = root
-			for k, v in self.getPrefs().items():
-				for p in self.prefs:
-					if p.propertyName == k:
-						try:
-							p(v) # set the property in the owner object
-						except:
-							pass
+			self._rootChildren = rootChildren
+			self._savedContent = (
+					tuple((f.filename, f.geometry, tuple((v.id, v.geometry) for v in f.openViews)) for f in openFiles),
+					tuple((p.propertyName, storedTexts.get(p.propertyName)) for p in self.prefs))
 			return root
 		
+	def _unserialize(self, elem:et.Element) -> Any:
+		"""
+		:return: The value of the pref stored in *elem*. If a *Pref* is bound to *elem*\ 's tag,
+			it unserializes the value (which also sets the property in its owner), otherwise
+			the value is just the unescaped text.
+			
+		.. note::
+		   The unescape is **not** redundant with ElementTree's own entity decoding: :meth:`save`
+		   escapes the text before ElementTree escapes it again, so one level is left after parsing.
+		"""
+		text = util.xmlUnescape(elem.text)
+		p = self._prefsByName.get(elem.tag)
+		return text if p is None else p.unserialize(text)
+		
 	def getPrefs(self) -> Dict[str, Any]:
 		"""
 		Read all the prefs stored in the XML element and return as a dictionary.
 		"""
 		ret:Dict[str, Any] = dict()
-		elems = self.root.findall('./*')
-		for elem in elems:
+		for elem in self.root: # direct iteration over the children: no path to evaluate
 			if elem.tag == "openfiles": continue
-			found = False
-			for p in self.prefs:
-				if p.propertyName == elem.tag:
-					ret[elem.tag] = p.unserialize(util.xmlUnescape(elem.text))
-					found = True
-					break
-			if not found:
-				ret[elem.tag] = util.xmlUnescape(elem.text)
+			ret[elem.tag] = self._unserialize(elem)
 		return ret
 	
 	def getPref(self, prop:Union[str,Pref]) -> Any:
 		assert isinstance(prop, str) or isinstance(prop, Pref)
-		elem = self.root.find('./'+(prop if isinstance(prop, str) else prop.propertyName))
+		elem = self._rootChildren.get(prop if isinstance(prop, str) else prop.propertyName)
 		if elem is None: return None
 		if isinstance(prop, Pref):
-			return util.xmlUnescape(prop.unserialize(elem.text))
+			return prop.unserialize(util.xmlUnescape(elem.text))
 		else:
-			for p in self.prefs:
-				if prop == elem.tag:
-					return util.xmlUnescape(p.unserialize(elem.text))
-			return util.xmlUnescape(elem.text)
+			return self._unserialize(elem)
 
 	def getOpenFilesData(self) -> List[FileData]:
-		openFilesData:List[FileData] = []
-		for fd in self.root.findall("./openfiles/file"):
-			fileData = FileData()
-			fileData.filename = fd.get("name")
-			fileData.geometry = fd.get("geometry")
-			for vd in fd.findall("./openview"):
-				fdata = ViewData()
-				fdata.id = vd.get("id")
-				fdata.geometry = vd.get("geometry")
-				fileData.openViews.append(fdata)
-			openFilesData.append(fileData)
-		return openFilesData
+		"""
+		:return: The files (and their views) that were open when the prefs were last saved,
+			as collected by :meth:`read`\ .
+		"""
+		return list(self._openFiles)
 	
 	def __getitem__(self, key) -> Any:
-		for p in self.prefs:
-			if p.propertyName == key:
-				return p()
+		p = self._prefsByName.get(key)
+		if p is not None:
+			return p.get()
 		raise AttributeError(f'Prefs["{key}"] <access>: Unknown key.')
 	
 	def __setitem__(self, key, value):
-		for p in self.prefs:
-			if p.propertyName == key:
-				return p(value)
+		p = self._prefsByName.get(key)
+		if p is not None:
+			p.set(value)
+			return
 		raise AttributeError(f'Prefs["{key}"] <assignment>: Unknown key.')
 	
 	def bind(self, propertyName:str, owner:Any, kind:str, userName:Optional[str]=None, 
@@ -312,16 +394,12 @@ class Prefs:
 		:param pythonType: The python type corresponding to the type parameter T. (because
 			python hasn't got it together on getting the top class yet...)
 		"""
-		typ = Any
-		if kind.startswith("choices:") or kind=="text":
-			typ = str
-		if kind == "int":
-			typ = int
-		if kind == "bool":
-			typ = bool
-		self.prefs.append(Pref[typ](propertyName, owner, kind, userName=userName,
+		typ = _kindType(kind) or Any # (an unknown kind is reported by Pref.__init__())
+		pref = Pref[typ](propertyName, owner, kind, userName=userName,
 							help=help, validatorFunc=validatorFunc, 
-							pythonType=pythonType))
+							pythonType=pythonType)
+		self.prefs.append(pref)
+		self._prefsByName.setdefault(propertyName, pref) # as with the old linear scans, the first binding wins
 
 	def edit(self, parentWindow, title=None):
 		"""
@@ -336,8 +414,6 @@ class Prefs:
 		
 
 
-#ChangeDescr = namedtuple("ChangeDescr", "oldValue tkVar delete")
-
 class PrefsEditor(tk.Toplevel):
 
 	def __init__(self, parent, owner, prefs:List[Pref], title="Attribute Editor"):
@@ -347,6 +423,13 @@ class PrefsEditor(tk.Toplevel):
 		self.owner = owner
 		self.prefs = prefs
 		self.deleting = False
+		self._validators:Dict[str, Tuple[Pref, tk.StringVar]] = {} # widget name -> (pref, var); see _validate()
+		self._initial:Dict[Pref, str] = {} # the editors' starting values; see save()
+		
+	def _validate(self, editedValue, widgetName) -> bool:
+		"""The single validatecommand shared by all the editors; Tk passes the widget's name."""
+		pref, tkVar = self._validators[widgetName]
+		return self.checkEntry(editedValue, pref, tkVar)
 		
 	def checkEntry(self, editedValue, pref, tkVar) -> bool:
 		if self.deleting: return True
@@ -378,38 +461,34 @@ class PrefsEditor(tk.Toplevel):
 		self.columnconfigure(cEdit,  weight=2)
 		self.columnconfigure(cKind,  weight=0)
 		
+		# one Tcl command validates every editor: it finds the pref by the widget name (%W)
+		checkWrapper = (self.winfo_toplevel().register(self._validate), '%P', '%W')
+		labelFont = ('Helvetica', 14, 'normal')
 		i = 0
 		for pref in self.prefs:
-			label = ttk.Label(self, text=pref.userName+':', font=('Helvetica', 14, 'normal'))
+			label = ttk.Label(self, text=pref.userName+':', font=labelFont)
 			label.grid(column=cLabel, row=i, sticky=tk.E, padx=0, pady=0)
 			if pref.help is not None and len(pref.help)>0:
 				CreateToolTip(label, pref.help)
 			editor = None
-			if pref.kind == 'text':
-				var = tk.StringVar(value=pref())
-				checkWrapper = (self.winfo_toplevel().register(lambda v, pref=pref, var=var: self.checkEntry(v,pref,var)), '%P')
+			kind = pref.kind
+			if kind == 'text' or kind == 'int':
+				var = tk.StringVar(value=pref.get())
 				editor = ttk.Entry(self, textvariable=var, validate="focusout", validatecommand=checkWrapper)
-				setattr(pref, "tkVar", var) # now pref has a new property holding the variable
-			elif pref.kind.startswith("choices:"):
-				var = tk.StringVar(value=pref())
-				checkWrapper = (self.winfo_toplevel().register(lambda v, pref=pref, var=var: self.checkEntry(v,pref,var)), '%P')
+			elif kind.startswith("choices:"):
+				var = tk.StringVar(value=pref.get())
 				editor = ttk.Combobox(self, textvariable=var, validate="focusout", validatecommand=checkWrapper)
-				editor['values'] = pref.kind.split(':')[1:]
+				editor['values'] = kind.split(':')[1:]
 				editor.state(["readonly"])
-				setattr(pref, "tkVar", var) # now pref has a new property holding the variable
-			elif pref.kind == 'int':
-				var = tk.StringVar(value=pref())
-				checkWrapper = (self.winfo_toplevel().register(lambda v, pref=pref, var=var: self.checkEntry(v,pref,var)), '%P')
-				editor = ttk.Entry(self, textvariable=var, validate="focusout", validatecommand=checkWrapper)
-				setattr(pref, "tkVar", var) # now pref has a new property holding the variable
-			elif pref.kind == 'bool':
-				var = tk.StringVar(value=pref())
-				checkWrapper = (self.winfo_toplevel().register(lambda v, pref=pref, var=var: self.checkEntry(v,pref,var)), '%P')
+			elif kind == 'bool':
+				var = tk.StringVar(value=pref.get())
 				editor = ttk.Checkbutton(self, variable=var, onvalue='True', offvalue='False')
-				setattr(pref, "tkVar", var) # now pref has a new property holding the variable
 			else:
-				print(f'PrefsEditor.show(): Unknown kind "{pref.kind}".')
+				print(f'PrefsEditor.show(): Unknown kind "{kind}".')
 			if editor is not None:
+				setattr(pref, "tkVar", var) # now pref has a new property holding the variable
+				self._validators[str(editor)] = (pref, var)
+				self._initial[pref] = var.get()
 				editor.grid(column=cEdit, row=i, sticky='EW', padx=0, pady=0)
 			i += 1				
 			
@@ -435,14 +514,14 @@ class PrefsEditor(tk.Toplevel):
 		
 	def save(self):
 		badVals = 0
-		for pref in self.prefs:
+		for pref, initialVal in self._initial.items(): # (only the prefs that got an editor)
 			newVal = pref.tkVar.get() #TODO: do something different for non-Entry types
-			if pref() != newVal:
+			if newVal != initialVal: # compare as shown: the owner's value may not be a str
 				valid = pref.validate(newVal)
 				if valid is None:
 					badVals += 1
 					print(f'PrefsEditor.save(): Invalid value "{pref.tkVar.get()}" for "{pref.propertyName}" ("{pref.userName}").')
 				else:
-					pref(valid)
+					pref.set(valid)
 		self.dismiss()
 		
\ No newline at end of file
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod # Abstract Base Class
+from collections import deque
 from typing import Union, Optional, Any, Tuple, List, Dict
 from tygra.mobjects import MObject
 from tygra.mnodes import MNode
@@ -26,10 +27,15 @@ from tygra.mrelations import MRelation
 # SOFTWARE.																		#
 #################################################################################
 
-class RelationProperty():
+class RelationProperty(ABC):
+
+	isTransitive = False # *MObject.isRelatedTo()* walks transitive chains itself
+
+	def __init_subclass__(cls, **kwargs):
+		super().__init_subclass__(**kwargs)
+		cls._instance = None # each subclass is its own singleton; see getInstance()
 
 	def __init__(self):
-		assert type(self) != RelationProperty
 		if type(self)._instance is None:
 			type(self)._instance = self
 		else:
@@ -46,19 +52,18 @@ class RelationProperty():
 		
 	@abstractmethod
 	def isRelated(self, relType:MRelation, fromNode:MObject, relation:MRelation, 
-					toNode:Optional[MObject]=None, _omit:set=set()) \
+					toNode:Optional[MObject]=None, _omit:frozenset=frozenset(), _checked:bool=False) \
 											-> Union[bool,set[MObject]]:
 		pass
 		
 class ReflexiveProperty(RelationProperty):
 
 	_priority = 2
-	_instance = None
 
 	def isRelated(self, relType:MRelation, fromNode:MObject, relation:MRelation, 
-					toNode:Optional[MObject]=None, _omit:set=set()) \
+					toNode:Optional[MObject]=None, _omit:frozenset=frozenset(), _checked:bool=False) \
 											-> Union[bool,set[MObject]]:
-		assert relation.isa(relType), f'{type(self).__name__}.isRelated(): Expected a relation argument (type {type(relation).__name__}) to be a subtype of the relType, {type(relType).__name__}.'
+		assert _checked or relation.isa(relType), f'{type(self).__name__}.isRelated(): Expected a relation argument (type {type(relation).__name__}) to be a subtype of the relType, {type(relType).__name__}.'
 		if toNode: # return a bool
 			return relation.fromNode is fromNode
 		else: # return a tree list
@@ -67,37 +72,38 @@ class ReflexiveProperty(RelationProperty):
 class SymmetricProperty(RelationProperty):
 
 	_priority = 3
-	_instance = None
 
 	def isRelated(self, relType:MRelation, fromNode:MObject, relation:MRelation, 
-					toNode:Optional[MObject]=None, _omit:set=set()) \
+					toNode:Optional[MObject]=None, _omit:frozenset=frozenset(), _checked:bool=False) \
 											-> Union[bool,set[MObject]]:
-		assert relation.isa(relType), f'{type(self).__name__}.isRelated(): Expected a relation argument (type {type(relation).__name__}) to be a subtype of the relType, {type(relType).__name__}.'
+		assert _checked or relation.isa(relType), f'{type(self).__name__}.isRelated(): Expected a relation argument (type {type(relation).__name__}) to be a subtype of the relType, {type(relType).__name__}.'
+		frm, to = relation.fromNode, relation.toNode
 		if toNode: # return a bool
-			if fromNode is relation.fromNode and toNode is relation.toNode  : return True
-			if fromNode is relation.toNode   and toNode is relation.fromNode: return True
-			return False
+			return (fromNode is frm and toNode is to) or (fromNode is to and toNode is frm)
 		else: # return a tree list
-			if fromNode is relation.toNode: return [relation.fromNode]
-			return []
+			return [frm] if fromNode is to else []
 			
 class TransitiveProperty(RelationProperty):
 
 	_priority = 4
-	_instance = None
+	isTransitive = True
 
 	def isRelated(self, relType:MRelation, fromNode:MObject, relation:MRelation, 
-					toNode:Optional[MObject]=None, _omit:set=set()) \
+					toNode:Optional[MObject]=None, _omit:frozenset=frozenset(), _checked:bool=False) \
 											-> Union[bool,set[MObject]]:
-		assert relation.isa(relType), f'{type(self).__name__}.isRelated(): Expected a relation argument (type {type(relation).__name__}) to be a subtype of the relType, {type(relType).__name__}.'
-		if toNode: # return a bool
-			assert relation.isa(relType), f'{type(self).__name__}.isRelated(): Expected a relation argument (type {type(relation).__name__}) to be a subtype of the relType, {type(relType).__name__}.'
-			if fromNode in _omit: return False
-			return relation.toNode.isRelatedTo(relType, toNode, _omit=_omit.union([fromNode]))
-		else: # return a tree list
-			if fromNode in _omit: return []
-			return relation.toNode.isRelatedTo(relType, _omit=_omit.union([fromNode]))
+		assert _checked or relation.isa(relType), f'{type(self).__name__}.isRelated(): Expected a relation argument (type {type(relation).__name__}) to be a subtype of the relType, {type(relType).__name__}.'
+		if fromNode in _omit: 
+			return False if toNode else []
+		if not isinstance(_omit, set): _omit = set(_omit) # the default (or a caller's frozenset) is not ours to mark
+		_omit.add(fromNode) # marked only while the chain beyond it is searched
+		try:
+			return relation.toNode.isRelatedTo(relType, toNode, _omit=_omit)
+		finally:
+			_omit.discard(fromNode)
 
+REFLEXIVE  = ReflexiveProperty.getInstance()
+SYMMETRIC  = SymmetricProperty.getInstance()
+TRANSITIVE = TransitiveProperty.getInstance()
 		
 		
 if __name__ == "__main__":
@@ -148,7 +154,7 @@ if __name__ == "__main__":
 						return False
 				return True
 			else:
-				assert type(nodeType) == type(self)
+				assert type(nodeType) is type(self)
 				if nodeType==self: return True
 				for r in self.relations:
 					if r._isa and r.fromNode is self:
@@ -182,14 +188,14 @@ if __name__ == "__main__":
 						return False
 				return True
 			else:
-				assert type(nodeType) == type(self)
+				assert type(nodeType) is type(self)
 				for r in self.relations:
 					if r._isa and r.fromNode is self:
 						if r.toNode is nodeType:
 							return True
 				return False
 			
-		def isRelatedTo(self, relType, toNode=None, _omit:set=set()) -> set:
+		def isRelatedTo(self, relType, toNode=None, _omit:frozenset=frozenset()) -> set:
 			"""
 			Check if this *MObject* is related to *nodeType* as related through
 			some chain of relations that are subtypes of *reltype*. Or, if *nodeType* is *None*, 
@@ -212,34 +218,47 @@ if __name__ == "__main__":
 					* *MObject*: return True iff *toNode* is related to this *MObject* through
 						 some chain of relations that are subtypes of *relType.
 			:type toNode: Self
-			:param _omit: Should never be used. Used ONLY by relational properties to prevent
-				infinite recursion in following relation chains.
+			:param _omit: Should never be used. Nodes whose transitive relations are not
+				followed.
 			:return: Depends on the *ToNode* argument, as above. Type: set[Self]
 			"""
 			assert isinstance(relType, MRelation), f'MObject.isRelatedTo() [MObject]: Argument relType must be a MRelation or list of MRelations, but got argument of type {type(relType).__name__}.'
 			if toNode: # return a bool
-				for r in self.relations:
-					if r.isa(relType):
-						if r.fromNode is self and r.toNode is toNode: return True
-						for behaviour in r.properties:
-							if behaviour.isRelated(relType, self, r, toNode, _omit=_omit.union([toNode])):
-								return True
-				return False
-			else: # return a tree list
-				result = []
-				for r in self.relations:
-					if r.isa(relType):
-						if r.fromNode is self: 
-							result.append(r.toNode)
-						for behaviour in r.properties:
-							related = behaviour.isRelated(relType, self, r, _omit=_omit)#.union(result))
-							if len(related): result += related
-				return set(result) 
+				blocked = _omit.union([toNode])
+			else: # return a set
+				blocked = _omit
+				result = set()
+			frontier = deque([self]) # nodes reached through transitive relations, searched breadth-first
+			visited = {self}
+			popleft, push = frontier.popleft, frontier.append
+			while frontier:
+				node = popleft()
+				follow = node not in blocked
+				for r in node.relations:
+					if not r.isa(relType): continue
+					to = r.toNode
+					if r.fromNode is node:
+						if toNode:
+							if to is toNode: return True
+						else:
+							result.add(to)
+					for behaviour in r.properties:
+						if behaviour.isTransitive: # follow the chain here rather than recursing through the behaviour
+							if follow and to not in visited:
+								visited.add(to)
+								push(to)
+						elif toNode:
+							if behaviour.isRelated(relType, node, r, toNode, _checked=True): return True
+						else:
+							result.update(behaviour.isRelated(relType, node, r, _checked=True))
+			return False if toNode else result
 		
 
 	class MNode(MObject):
 		pass
 
+	_propertiesCache:Dict[frozenset, tuple] = {} # see MRelation.resetProperties()
+	
 	class MRelation(MObject):
 		def __init__(self, name, fromNode, toNode, isa=[], properties=[]):
 			super().__init__(name, isa=isa)
@@ -252,11 +271,11 @@ if __name__ == "__main__":
 			self.resetProperties()
 		
 		def resetProperties(self):
-			self.properties = self.declaredProperties
-			for parent in self.isparent():
-				self.properties += parent.properties
-			self.properties = list(set(self.properties))  if len(self.properties) else []# eliminate any duplicates
-			self.properties.sort(key=lambda prop: prop.priority)
+			props = frozenset(self.declaredProperties).union(*(parent.properties for parent in self.isparent()))
+			properties = _propertiesCache.get(props) # relations with the same set of properties share one sorted tuple
+			if properties is None:
+				properties = _propertiesCache[props] = tuple(sorted(props, key=lambda prop: prop.priority))
+			self.properties = properties
 		
 		def validateReferents(self):
 			if not ((isinstance(self.fromNode, MNode) and isinstance(self.toNode, MNode)) or \
@@ -272,11 +291,15 @@ if __name__ == "__main__":
 
 	testsFailed = 0
 	testsPassed = 0
+	_compiledTests:Dict[str, Any] = {} # test string -> code object, so a test string is only compiled once
 	def test(test:str, expected:Any=None, throws:Exception=None):
 		global testsPassed
 		global testsFailed
 		try:
-			r = eval(test)
+			code = _compiledTests.get(test)
+			if code is None:
+				code = _compiledTests[test] = compile(test, '<test>', 'eval')
+			r = eval(code)
 		except Exception as ex:
 			if type(ex) == throws:
 				testsPassed += 1
@@ -330,9 +353,9 @@ if __name__ == "__main__":
 	test("N21.isa([])", True)
 	
 	R   = MRelation("R",    N, N)
-	RR  = MRelation("RR",   N, N, isa=[R]      , properties=[ReflexiveProperty.getInstance()])
-	RS  = MRelation("RS",   N, N, isa=[R]      , properties=[SymmetricProperty.getInstance()])
-	RT  = MRelation("RT",   N, N, isa=[R]      , properties=[TransitiveProperty.getInstance()])
+	RR  = MRelation("RR",   N, N, isa=[R]      , properties=[REFLEXIVE])
+	RS  = MRelation("RS",   N, N, isa=[R]      , properties=[SYMMETRIC])
+	RT  = MRelation("RT",   N, N, isa=[R]      , properties=[TRANSITIVE])
 	RRS = MRelation("RRS",  N, N, isa=[RR, RS])
 	RST = MRelation("RST",  N, N, isa=[RS, RT])
 	RRT = MRelation("RRT",  N, N, isa=[RR, RT])
@@ -38,6 +38,7 @@ This module contains the 3 fundamental container objects for **tygra**:
 #################################################################################
 
 import sys
+from types import FunctionType
 import os
 import tkinter as tk
 from tkinter import ttk
@@ -72,6 +73,8 @@ from tygra.prefs import Prefs, Pref
 		
 class _TempLogger: # A logger to use only until the constructor is far enough to use the real one.
 	def write(self, s, **kwargs): 
+		if isinstance(s, FunctionType): # a deferred message; see LoggingPanedWindow.write()
+			s = s()
 		prefix = ""
 		out = sys.__stdout__
 		if "level" in kwargs:
@@ -771,11 +774,12 @@ class TGModel(PO, IDServer):
 		
 		# call the PO (persistent object) constructor
 		PO.__init__(self, idServer=idServer if idServer else container, _id=_id)
-		
+		self._idString = self.idServer.getIDString(self.id) # never changes; MObject.serializeXML() writes it on every object
 		
 		self._nodes:List[MNode] = []
 		self._relations:List[MRelation] = []
 		self.observers = WeakList()
+		self._isaReady = False # set once self.isa (the mother isa) exists; see Isa.__init__()
 		
 		self.topNode = None
 		self.topRelation = None
@@ -831,6 +835,7 @@ class TGModel(PO, IDServer):
 		
 		# (1,8), isa:(1,9)
 		self.isa = Isa(self, frm=self.topNode, to=self.topNode, idServer=self)
+		self._isaReady = True
 		self.isa.attrs["fillColor"] = ""
 		self.isa.attrs["borderColor"] = ""
 		self.isa.attrs["textColor"] = "blue"
@@ -945,10 +950,12 @@ class TGModel(PO, IDServer):
 				addrServer.idRegister(n.idString, n)
 				assert n.system
 				
-			# load in the nodes
+			# load in the nodes; each subelement is cleared once its object is built so the
+			# parsed subtrees don't stay resident for the whole load
 			nodes = elem.find("nodes")
 			for subelem in nodes.iterfind("*"):
 				node = self.makeObject(subelem, addrServer, MNode) # The mnodes will enter themselves into self._nodes
+				subelem.clear()
 				if node.attrs.get("label", includeInherited=False) == app.TOP_NODE:
 					self.topNode = node
 					
@@ -961,8 +968,10 @@ class TGModel(PO, IDServer):
 						self.topRelation = rel
 					if rel.attrs.get("label", includeInherited=False) == app.ISA:
 						self.isa = rel
+						self._isaReady = True
 				except Exception as ex:
 					self.logger.write(f'Exception instantiating {subelem.get("id")}.', level='warning', exception=ex)
+				subelem.clear()
 			# in case there were any address-lookup faults, give the relations a chance to fix it.
 			
 			# let the relations finish up
@@ -1390,7 +1399,7 @@ class TGView(tk.Canvas, PO, IDServer, ModelObserver):
 					continue  # only executed if the inner loop did NOT break
 				break  # only executed if the inner loop DID break
 			if item is not None:
-				self.logger.write(f"making relation from {self._makingRelationFrom.node} to {item} of type {self._makingRelationFrom.type}.", level="debug")
+				self.logger.write(lambda: f"making relation from {self._makingRelationFrom.node} to {item} of type {self._makingRelationFrom.type}.", level="debug")
 				self.makeRelation(self._makingRelationFrom.node, item, self._makingRelationFrom.type)
 			else:
 				self.logger.write("Relation's toNode must match the being a node/relation with the from Node", level='error')
@@ -169,6 +169,7 @@ class PO(ABC):
 			- Called just after an object is constructed, and is used to clean up anything
 			  from the constructor specific to unserialization.
 	"""
+	__slots__ = ('idServer', 'id') # subclasses that don't declare __slots__ still get a __dict__
 	
 	def __init__(self, idServer:IDServer=None, _id:Optional[int]=None):
 		"""
@@ -461,6 +462,8 @@ def xmlUnescape( strXML: str ) -> str:
 	"""
 	Replaces XML escape codes with "&", "<", ">", and single and double quote characters.
 	"""
+	if "&" not in strXML: # the usual case: nothing to replace, so skip the five passes
+		return strXML
 	return strXML	.replace("&amp;", "&") \
 					.replace("&lt;", "<") \
 					.replace("&gt;", ">") \
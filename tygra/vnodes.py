@@ -833,6 +833,11 @@ class VNode(VObject):
 			if modelObj == self.model:
 				self.notifyAttrChanged(self.model.attrs, info[0], info[1])
 			self.redraw()
+		elif modelOperation == 'mod attrs': # several at once (eg: from the attribute editor), so only one redraw
+			if modelObj == self.model:
+				for name, value in info:
+					self.notifyAttrChanged(self.model.attrs, name, value)
+			self.redraw()
 
 		elif modelOperation == 'add rel':
 			# the model is telling us about a added relation, but we rely on the VRelation's model to handle any added relations.
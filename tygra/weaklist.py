@@ -106,6 +106,55 @@ class WeakList(list):
 		self._refs *= n
 		return self
 		
+class WeakOrderedSet:
+	"""
+	A set of weak references which iterates in insertion order. Membership is by
+	identity, and objects drop out of the set when they are garbage collected. Adding,
+	removing, and membership tests are all O(1).
+	"""
+	def __init__(self, seq=()):
+		self._refs = dict() # id(obj): weakref.ref(obj)
+		for x in seq: self.add(x)
+		
+	def _remover(self, key):
+		selfRef = weakref.ref(self)
+		def remove(wref):
+			s = selfRef()
+			if s is not None and s._refs.get(key) is wref:
+				del s._refs[key]
+		return remove
+
+	def add(self, obj):
+		key = id(obj)
+		if key not in self._refs:
+			self._refs[key] = weakref.ref(obj, self._remover(key))
+			
+	def discard(self, obj) -> bool:
+		":return: *True* iff *obj* was in the set."
+		if obj in self:
+			del self._refs[id(obj)]
+			return True
+		return False
+		
+	def remove(self, obj):
+		if not self.discard(obj):
+			raise KeyError(obj)
+
+	def __contains__(self, obj):
+		ref = self._refs.get(id(obj))
+		return ref is not None and ref() is obj
+
+	def __iter__(self):
+		for ref in list(self._refs.values()): # copy, so the set may change during iteration
+			obj = ref()
+			if obj is not None: yield obj
+
+	def __len__(self):
+		return len(self._refs)
+
+	def __repr__(self):
+		return "WeakOrderedSet(%r)" % list(self)
+
 if __name__ == "__main__":
 	class Obj(): 
 		def __init__(self, s): self.s = s